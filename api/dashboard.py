@@ -0,0 +1,57 @@
+"""
+Vercel Serverless Function: Get Yandex Direct Dashboard
+Campaigns, totals and per-campaign statistics in one invocation
+"""
+import os
+import sys
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qs, urlparse
+
+# Shared modules live in the project root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# Module-level state (Direct client, cache, rollups) survives warm invocations
+from yandex_direct_serverless import client, credentials, send_json
+
+
+class handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        """Handle GET request for the combined dashboard (?days=30&fields=Id,Name,Statistics)"""
+        try:
+            # Get credentials from environment variables
+            access_token, login = credentials()
+
+            if not access_token or not login:
+                send_json(self, 500, {"error": "Missing credentials"})
+                return
+
+            query = parse_qs(urlparse(self.path).query)
+            try:
+                days = int(query.get("days", ["30"])[0])
+            except ValueError:
+                days = 0
+            if days < 1:
+                send_json(self, 400, {"error": "days must be a positive integer"})
+                return
+            fields = query["fields"][0].split(",") if query.get("fields") else None
+
+            # One campaign list and one report for both parts of the dashboard
+            dashboard = client(access_token, login).get_dashboard(days=days, fields=fields)
+
+            if "error" in dashboard:
+                send_json(self, 500, dashboard)
+            else:
+                send_json(self, 200, {"success": True, **dashboard}, endpoint="dashboard")
+
+        except Exception as e:
+            send_json(self, 500, {"error": str(e)})
+
+    def do_OPTIONS(self):
+        """Handle CORS preflight request"""
+        self.send_response(200)
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Access-Control-Allow-Methods", "GET, OPTIONS")
+        self.send_header("Access-Control-Allow-Headers", "Content-Type, If-None-Match")
+        self.end_headers()
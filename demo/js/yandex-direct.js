@@ -136,46 +136,27 @@ async function loadYandexData() {
         // Показываем индикатор загрузки
         showLoadingIndicator();
 
-        // Загружаем реальные данные из API
-        const [statsResponse, campaignsResponse] = await Promise.all([
-            fetch(`${API_BASE_URL}/stats`),
-            fetch(`${API_BASE_URL}/campaigns`)
-        ]);
-
-        if (statsResponse.ok && campaignsResponse.ok) {
-            const statsData = await statsResponse.json();
-            const campaignsData = await campaignsResponse.json();
-
-            // Проверяем формат ответа (разные для local и Vercel)
-            let stats, campaigns;
-
-            if (statsData.success) {
-                // Vercel serverless format
-                stats = {
-                    impressions: statsData.stats.total_impressions || 0,
-                    clicks: statsData.stats.total_clicks || 0,
-                    cost: statsData.stats.total_cost || 0,
-                    ctr: statsData.stats.avg_ctr || 0,
-                    avgCpc: statsData.stats.avg_cpc || 0,
-                    conversions: statsData.stats.total_conversions || 0,
-                    conversionRate: statsData.stats.conversion_rate || 0
-                };
-            } else {
-                // FastAPI format (local development)
-                stats = {
-                    impressions: statsData.total_impressions || 0,
-                    clicks: statsData.total_clicks || 0,
-                    cost: statsData.total_cost || 0,
-                    ctr: statsData.avg_ctr || 0,
-                    avgCpc: statsData.avg_cpc || 0,
-                    conversions: statsData.total_conversions || 0,
-                    conversionRate: statsData.conversion_rate || 0
-                };
-            }
+        // Загружаем реальные данные из API: кампании, итоги и показатели
+        // по кампаниям приходят одним запросом (один вызов функции на Vercel)
+        const dashboardResponse = await fetch(`${API_BASE_URL}/dashboard?fields=Id,Name,Status,Statistics`);
+
+        if (dashboardResponse.ok) {
+            const dashboardData = await dashboardResponse.json();
+            const totals = dashboardData.totals || {};
+
+            // Формат одинаковый для local (FastAPI) и Vercel
+            const stats = {
+                impressions: totals.total_impressions || 0,
+                clicks: totals.total_clicks || 0,
+                cost: totals.total_cost || 0,
+                ctr: totals.avg_ctr || 0,
+                avgCpc: totals.avg_cpc || 0,
+                conversions: totals.total_conversions || 0,
+                conversionRate: totals.conversion_rate || 0
+            };
 
             // Преобразуем кампании из Yandex Direct формата
-            const campaignsArray = campaignsData.success ? campaignsData.campaigns : campaignsData.campaigns || [];
-            campaigns = campaignsArray.map(c => ({
+            const campaigns = (dashboardData.campaigns || []).map(c => ({
                 id: c.Id,
                 name: c.Name,
                 status: c.Status,
@@ -0,0 +1,544 @@
+#!/usr/bin/env python3
+"""
+Офлайн-тесты ядра клиента Yandex Direct
+Запросы к Direct подменяются httpx.MockTransport, токен не нужен.
+
+Запуск: python -m pytest test_yandex_direct_core.py
+(или python test_yandex_direct_core.py)
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+import httpx
+import requests
+
+# Добавляем текущую директорию в path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import yandex_direct_api
+from yandex_direct_api import YandexDirectAPI, YandexDirectError
+from yandex_direct_async import AsyncYandexDirectAPI, ReportJobManager
+from yandex_direct_cache import TTLCache
+from yandex_direct_flight import AsyncSingleFlight, SingleFlight
+from yandex_direct_retry import CircuitBreaker, RetryPolicy
+from yandex_direct_rollup import RollupStore
+from yandex_direct_store import stale_ranges
+
+
+REPORT_TSV = (
+    "CampaignId\tCampaignName\tDate\tImpressions\tClicks\tCost\tConversions\n"
+    "1\tBrand\t2026-01-01\t100\t5\t10.5\t1\n"
+    "1\tBrand\t2026-01-02\t200\t7\t14.0\t2\n"
+)
+
+
+class FakeResponse:
+    """Ответ requests: JSON, TSV-поток или статус Reports"""
+
+    def __init__(self, status_code: int = 200, data=None, text: str = "", headers=None):
+        self.status_code = status_code
+        self.reason = "Fake"
+        self.headers = headers or {}
+        self.text = json.dumps(data) if data is not None else text
+        self._data = data
+
+    def json(self):
+        if self._data is None:
+            raise ValueError("No JSON")
+        return self._data
+
+    def iter_content(self, chunk_size: int):
+        yield self.text.encode()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeSession:
+    """Сессия requests с заранее заданными ответами (или исключениями)"""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def post(self, url, headers=None, json=None, **kwargs):
+        self.requests.append({"url": url, "headers": headers, "json": json})
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+def fake_api(*responses, **kwargs) -> YandexDirectAPI:
+    """Синхронный клиент без задержек, отвечающий responses по очереди"""
+    kwargs.setdefault("retry", RetryPolicy(max_attempts=3, base_delay=0))
+    kwargs.setdefault("breaker", CircuitBreaker())
+    return YandexDirectAPI("token", "login", session=FakeSession(*responses), **kwargs)
+
+
+def report_tsv(rows) -> str:
+    """TSV отчёта с полями AGGREGATE_FIELDS"""
+    lines = ["\t".join(YandexDirectAPI.AGGREGATE_FIELDS)]
+    lines += ["\t".join(str(value) for value in row) for row in rows]
+    return "\n".join(lines) + "\n"
+
+
+def test_report_job_with_rollups_is_offline():
+    """Задание ReportJobManager уходит в Reports с processingMode=offline и через rollup"""
+    modes = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        modes.append(request.headers.get("processingMode"))
+        return httpx.Response(200, text=REPORT_TSV)
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as http_client:
+            api = AsyncYandexDirectAPI("token", "login", http_client=http_client, rollups=RollupStore())
+            jobs = ReportJobManager(api, max_wait=60)
+            return await jobs.run(date_from="2026-01-01", date_to="2026-01-02")
+
+    result = asyncio.run(run())
+
+    assert "error" not in result
+    assert modes == ["offline"]
+    assert sum(row["Clicks"] for row in result["data"]) == 12
+
+
+def days_ago(days: int) -> str:
+    return (date.today() - timedelta(days=days)).isoformat()
+
+
+def noon_of(day: str) -> float:
+    return (datetime.strptime(day, "%Y-%m-%d") + timedelta(hours=12)).timestamp()
+
+
+def test_stale_ranges_refetches_day_loaded_inside_restatement_window():
+    """День, загруженный пока был сегодняшним, перезапрашивается и после выхода из окна"""
+    day = days_ago(5)
+    assert stale_ranges({day: noon_of(day)}, day, day, restatement_days=3, recent_ttl=900) == [(day, day)]
+
+
+def test_stale_ranges_keeps_day_loaded_after_restatement_window():
+    """День, загруженный после окна пересчёта, закрыт навсегда"""
+    day = days_ago(10)
+    fetched = {day: noon_of(days_ago(2))}
+    assert stale_ranges(fetched, day, day, restatement_days=3, recent_ttl=900) == []
+
+
+def test_stale_ranges_waits_recent_ttl_inside_window():
+    """Сегодняшний день перезапрашивается не чаще recent_ttl"""
+    today = days_ago(0)
+    assert stale_ranges({today: time.time()}, today, today, restatement_days=3, recent_ttl=900) == []
+    assert stale_ranges({today: time.time() - 1000}, today, today, restatement_days=3, recent_ttl=900) == [(today, today)]
+
+
+def test_rollup_refreshes_restated_day_after_it_leaves_window():
+    """Rollup перезапрашивает день, загруженный пока был сегодняшним, и окно видит новые итоги"""
+    day = days_ago(5)
+    api = fake_api(FakeResponse(text=report_tsv([(1, "Brand", day, 1000, 50, 100.0, 5)])), rollups=RollupStore())
+
+    rollup = api.rollups.get("login")
+    partial = rollup.batch(day, day).add_rows([
+        {"CampaignId": 1, "CampaignName": "Brand", "Date": day, "Impressions": 100, "Clicks": 5, "Cost": 10.0, "Conversions": 0}
+    ])
+    rollup.apply(partial)
+    rollup._fetched[day] = noon_of(day)
+
+    assert rollup.missing_ranges(day, day) == [(day, day)]
+
+    api._rollup(day, day)
+
+    assert rollup.window(day, day).totals.clicks == 50
+    assert rollup.missing_ranges(day, day) == []
+    assert len(api.session.requests) == 1
+
+
+def stale_rollup(api, day: str, clicks: int):
+    """Rollup логина с днём, загруженным больше recent_ttl назад"""
+    rollup = api.rollups.get("login")
+    rollup.apply(rollup.batch(day, day).add_rows([
+        {"CampaignId": 1, "CampaignName": "Brand", "Date": day, "Impressions": 100, "Clicks": clicks, "Cost": 10.0, "Conversions": 0}
+    ]))
+    rollup._fetched[day] = time.time() - 1000
+    return rollup
+
+
+def test_aggregate_report_serves_stale_rollup_and_refreshes_in_background():
+    """Устаревший rollup отдаётся сразу, догрузка идёт в фоне и не блокирует ответ"""
+    today = days_ago(0)
+    release = threading.Event()
+
+    class SlowSession(FakeSession):
+        def post(self, *args, **kwargs):
+            release.wait(5)
+            return super().post(*args, **kwargs)
+
+    api = fake_api(rollups=RollupStore())
+    api.session = SlowSession(FakeResponse(text=report_tsv([(1, "Brand", today, 300, 9, 30.0, 1)])))
+    rollup = stale_rollup(api, today, clicks=5)
+
+    assert api.aggregate_report(None, today, today).totals.clicks == 5
+    assert api.aggregate_report(None, today, today).totals.clicks == 5
+
+    release.set()
+    deadline = time.time() + 5
+    while rollup._refreshing and time.time() < deadline:
+        time.sleep(0.01)
+
+    assert api.aggregate_report(None, today, today).totals.clicks == 9
+    assert len(api.session.requests) == 1
+
+
+def test_async_aggregate_report_serves_stale_rollup_and_refreshes_in_background():
+    """То же для асинхронного клиента: обновление - фоновая задача"""
+    today = days_ago(0)
+    requests_seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests_seen.append(request)
+        return httpx.Response(200, text=report_tsv([(1, "Brand", today, 300, 9, 30.0, 1)]))
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as http_client:
+            api = AsyncYandexDirectAPI(
+                "token", "login", http_client=http_client, rollups=RollupStore(), breaker=CircuitBreaker()
+            )
+            stale_rollup(api, today, clicks=5)
+            first = (await api.aggregate_report(None, today, today)).totals.clicks
+            await asyncio.gather(*api._background_tasks)
+            second = (await api.aggregate_report(None, today, today)).totals.clicks
+            return first, second
+
+    assert asyncio.run(run()) == (5, 9)
+    assert len(requests_seen) == 1
+
+
+def direct_error(code: int) -> dict:
+    return {"error": {"error_code": code, "error_string": "Error", "error_detail": ""}}
+
+
+CAMPAIGNS = {"result": {"Campaigns": [{"Id": 1, "Name": "Brand"}]}}
+
+
+@contextmanager
+def recorded_sleeps():
+    """Подменить time.sleep клиента: паузы записываются, а не выполняются"""
+    sleeps = []
+    original = yandex_direct_api.time.sleep
+    yandex_direct_api.time.sleep = lambda seconds: sleeps.append(seconds) if seconds else None
+    try:
+        yield sleeps
+    finally:
+        yandex_direct_api.time.sleep = original
+
+
+def test_get_retries_retryable_direct_error():
+    """Ошибка 52 (сервер недоступен) повторяется, ответ - со второй попытки"""
+    api = fake_api(FakeResponse(data=direct_error(52)), FakeResponse(data=CAMPAIGNS))
+    assert api._send_request("campaigns", "get", {}) == CAMPAIGNS
+    assert len(api.session.requests) == 2
+
+
+def test_get_does_not_retry_fatal_direct_error():
+    """Ошибка 53 (авторизация) не повторяется"""
+    api = fake_api(FakeResponse(data=direct_error(53)), FakeResponse(data=CAMPAIGNS))
+    assert api._send_request("campaigns", "get", {})["error"]["error_code"] == 53
+    assert len(api.session.requests) == 1
+
+
+def test_get_retries_http_5xx_and_network_errors():
+    """5xx и сетевые ошибки повторяются до max_attempts"""
+    api = fake_api(
+        FakeResponse(503, text="Unavailable"),
+        requests.exceptions.ConnectionError("reset"),
+        FakeResponse(data=CAMPAIGNS)
+    )
+    assert api._send_request("campaigns", "get", {}) == CAMPAIGNS
+    assert len(api.session.requests) == 3
+
+
+def test_mutations_are_not_retried():
+    """Не идемпотентные методы отправляются один раз"""
+    api = fake_api(FakeResponse(data=direct_error(52)), FakeResponse(data={"result": {}}))
+    assert api._send_request("campaigns", "suspend", {})["error"]["error_code"] == 52
+    assert len(api.session.requests) == 1
+
+
+def test_report_waits_retry_in_while_pending():
+    """Пока отчёт в очереди (201/202), пауза берётся из заголовка retryIn"""
+    tsv = report_tsv([(1, "Brand", "2026-01-01", 100, 5, 10.5, 1)])
+    api = fake_api(
+        FakeResponse(201, headers={"retryIn": "7"}),
+        FakeResponse(202, headers={"retryIn": "3"}),
+        FakeResponse(text=tsv)
+    )
+    with recorded_sleeps() as sleeps:
+        rows = list(api.iter_report(date_from="2026-01-01", date_to="2026-01-01", fields=YandexDirectAPI.AGGREGATE_FIELDS))
+
+    assert sleeps == [7.0, 3.0]
+    assert [row["Clicks"] for row in rows] == [5]
+    assert all(request["headers"]["processingMode"] == "auto" for request in api.session.requests)
+
+
+def test_report_gives_up_when_retry_in_exceeds_max_wait():
+    """Если retryIn не укладывается в max_wait, отчёт считается неготовым"""
+    api = fake_api(FakeResponse(201, headers={"retryIn": "60"}))
+    try:
+        list(api.iter_report(date_from="2026-01-01", date_to="2026-01-01", fields=["Date", "Clicks"], max_wait=10))
+    except YandexDirectError as e:
+        assert e.status == "pending"
+    else:
+        raise AssertionError("YandexDirectError expected")
+
+
+def test_circuit_breaker_open_half_open_closed():
+    """closed -> open после порога сбоев -> half-open с одной пробой -> closed"""
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.state == "closed" and breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.state == "half-open"
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_circuit_breaker_failed_probe_reopens():
+    """Неудачная проба снова открывает breaker на reset_timeout"""
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+
+def test_circuit_breaker_probe_timeout_allows_next_probe():
+    """Проба без записанного результата не блокирует breaker дольше probe_timeout"""
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01, probe_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.02)
+    assert breaker.allow()
+    assert not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()
+
+
+def test_open_breaker_skips_request():
+    """Пока breaker открыт, запрос к Direct не отправляется"""
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    breaker.record_failure()
+    api = fake_api(FakeResponse(data=CAMPAIGNS), breaker=breaker)
+    assert api._send_request("campaigns", "get", {})["status"] == "unavailable"
+    assert api.session.requests == []
+
+
+def test_report_network_error_during_probe_reopens_breaker():
+    """Сетевая ошибка Reports во время пробы записывается, breaker не залипает в half-open"""
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    api = fake_api(requests.exceptions.ConnectionError("reset"), breaker=breaker)
+    try:
+        list(api.iter_report(date_from="2026-01-01", date_to="2026-01-01", fields=["Date", "Clicks"]))
+    except YandexDirectError:
+        pass
+
+    assert breaker.state == "open"
+    time.sleep(0.06)
+    assert breaker.allow()
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    """N одновременных одинаковых вызовов - один вызов fn, результат у всех"""
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls, results = [], []
+
+    def fetch():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return {"value": 42}
+
+    threads = [threading.Thread(target=lambda: results.append(flight.do("key", fetch))) for _ in range(10)]
+    threads[0].start()
+    started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert results == [{"value": 42}] * 10
+    assert flight.in_flight() == 0
+
+
+def test_single_flight_passes_error_to_every_waiter():
+    """Ошибка ведущего вызова получают все ожидающие; следующий вызов выполняется заново"""
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    errors = []
+
+    def fetch():
+        started.set()
+        release.wait(5)
+        raise RuntimeError("Direct is down")
+
+    def call():
+        try:
+            flight.do("key", fetch)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=call) for _ in range(5)]
+    threads[0].start()
+    started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert errors == ["Direct is down"] * 5
+    assert flight.do("key", lambda: "fresh") == "fresh"
+
+
+def test_async_single_flight_coalesces_and_shares_errors():
+    """Асинхронный вариант: один вызов на ключ, ошибка - всем ожидающим"""
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "ok"
+
+    async def failing():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    async def run():
+        flight = AsyncSingleFlight()
+        values = await asyncio.gather(*(flight.do("key", fetch) for _ in range(10)))
+        errors = await asyncio.gather(*(flight.do("other", failing) for _ in range(5)), return_exceptions=True)
+        return values, errors, flight.in_flight()
+
+    values, errors, in_flight = asyncio.run(run())
+    assert values == ["ok"] * 10
+    assert [str(error) for error in errors] == ["boom"] * 5
+    assert len(calls) == 2
+    assert in_flight == 0
+
+
+def test_concurrent_client_requests_reach_direct_once():
+    """Одинаковые одновременные get-запросы клиента дают один запрос к Direct"""
+    release = threading.Event()
+
+    class SlowSession(FakeSession):
+        def post(self, *args, **kwargs):
+            release.wait(5)
+            return super().post(*args, **kwargs)
+
+    api = fake_api()
+    api.session = SlowSession(FakeResponse(data=CAMPAIGNS))
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(api._make_request("campaigns", "get", {"SelectionCriteria": {}})))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert results == [CAMPAIGNS] * 8
+    assert len(api.session.requests) == 1
+
+
+def test_ttl_cache_fresh_stale_expired():
+    """Запись свежая до TTL, устаревшая до TTL + stale_ttl, затем истекшая (но доступна через peek)"""
+    cache = TTLCache(ttls={"campaigns": 0.05}, stale_ttl=0.05)
+    cache.set("campaigns", "key", "value")
+    assert cache.get("key") == "value"
+
+    time.sleep(0.06)
+    entry = cache.lookup("key")
+    assert entry is not None and not entry.is_fresh
+    assert cache.get("key") is None
+
+    time.sleep(0.05)
+    assert cache.lookup("key") is None
+    assert cache.peek("key") == "value"
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    """Сверх max_entries вытесняется запись, к которой дольше всего не обращались"""
+    cache = TTLCache(max_entries=2)
+    cache.set("campaigns", "a", 1)
+    cache.set("campaigns", "b", 2)
+    cache.lookup("a")
+    cache.set("campaigns", "c", 3)
+
+    assert cache.get("a") == 1
+    assert cache.peek("b") is None
+    assert cache.get("c") == 3
+
+
+def test_ttl_cache_single_refresh_per_key():
+    """Фоновое обновление записи запускается только один раз"""
+    cache = TTLCache()
+    cache.set("campaigns", "key", "value")
+    assert cache.begin_refresh("key")
+    assert not cache.begin_refresh("key")
+    cache.end_refresh("key")
+    assert cache.begin_refresh("key")
+
+
+def test_stale_cache_entry_is_served_while_refreshing():
+    """Устаревшее значение отдаётся сразу, обновление идёт в фоне и заменяет его"""
+    updated = {"result": {"Campaigns": [{"Id": 1, "Name": "Brand 2"}]}}
+    api = fake_api(
+        FakeResponse(data=CAMPAIGNS),
+        FakeResponse(data=updated),
+        cache=TTLCache(ttls={"campaigns": 0.05})
+    )
+    params = {"SelectionCriteria": {}}
+    assert api._make_request("campaigns", "get", params) == CAMPAIGNS
+
+    time.sleep(0.06)
+    assert api._make_request("campaigns", "get", params) == CAMPAIGNS
+
+    deadline = time.time() + 5
+    while api._make_request("campaigns", "get", params) != updated and time.time() < deadline:
+        time.sleep(0.01)
+
+    assert api._make_request("campaigns", "get", params) == updated
+    assert len(api.session.requests) == 2
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✅ {name}")
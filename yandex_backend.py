@@ -3,9 +3,21 @@ FastAPI Backend for Yandex Direct Integration
 Provides REST API endpoints for the dashboard
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from yandex_direct_api import YandexDirectAPI
+from fastapi.responses import Response, StreamingResponse
+from yandex_direct_async import AsyncYandexDirectAPI, ReportJobManager, create_async_client
+from yandex_direct_cache import TTLCache
+from yandex_direct_events import StatsBroadcaster
+from yandex_direct_export import EXPORT_WRITERS, export_formats
+from yandex_direct_http import NO_STORE, conditional_headers, etag_matches
+from yandex_direct_limits import UnitsLimiter
+from yandex_direct_query import ReportQuery
+from yandex_direct_registry import ClientRegistry
+from yandex_direct_retry import breakers_snapshot
+from yandex_direct_rollup import RollupStore
+from yandex_direct_store import ReportStore
+from yandex_direct_warmup import WarmupScheduler
 from dotenv import load_dotenv
 import os
 
@@ -27,6 +39,37 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+API_PREFIX = "/api/yandex-direct/"
+
+
+@app.middleware("http")
+async def conditional_responses(request: Request, call_next):
+    """
+    ETag / If-None-Match and per-endpoint Cache-Control for JSON GET responses
+
+    The dashboard and the CDN revalidate instead of re-downloading identical
+    payloads: an unchanged body is answered with 304 and no content.
+    Streaming responses (export) and non-GET requests pass through untouched.
+    """
+    response = await call_next(request)
+    path = request.url.path
+    if request.method != "GET" or not path.startswith(API_PREFIX):
+        return response
+    if response.headers.get("content-type") != "application/json":
+        return response
+    if response.status_code != 200:
+        response.headers["Cache-Control"] = NO_STORE
+        return response
+
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    headers = {key: value for key, value in response.headers.items() if key != "content-length"}
+    headers.update(conditional_headers(body, path[len(API_PREFIX):].split("/")[0]))
+
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        headers.pop("content-type")
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, status_code=200, headers=headers)
+
 # Initialize Yandex Direct client
 ACCESS_TOKEN = os.getenv("YANDEX_DIRECT_TOKEN")
 LOGIN = os.getenv("YANDEX_DIRECT_LOGIN")
@@ -34,13 +77,119 @@ LOGIN = os.getenv("YANDEX_DIRECT_LOGIN")
 if not ACCESS_TOKEN or not LOGIN:
     raise ValueError("YANDEX_DIRECT_TOKEN and YANDEX_DIRECT_LOGIN must be set in .env file")
 
-client = YandexDirectAPI(
-    access_token=ACCESS_TOKEN,
-    login=LOGIN,
-    is_sandbox=False
+# In-memory cache: hot dashboards are served from memory, stale entries
+# are returned immediately while a single background refresh runs
+cache = TTLCache(
+    max_entries=int(os.getenv("YANDEX_DIRECT_CACHE_SIZE", "512")),
+    ttls={
+        "campaigns": int(os.getenv("YANDEX_DIRECT_CAMPAIGNS_TTL", "300")),
+        "reports": int(os.getenv("YANDEX_DIRECT_REPORTS_TTL", "900"))
+    }
+)
+
+# Day-partitioned report store: closed days are downloaded once,
+# only today and the restatement window are re-pulled
+store = ReportStore(
+    path=os.getenv("YANDEX_DIRECT_STORE_PATH", "yandex_direct_reports.sqlite3"),
+    restatement_days=int(os.getenv("YANDEX_DIRECT_RESTATEMENT_DAYS", "3"))
+)
+
+# Campaign x day rollups with prefix sums: dashboard windows and /report
+# ranges are answered from memory, only new and restated days are pulled
+rollups = RollupStore(
+    restatement_days=int(os.getenv("YANDEX_DIRECT_RESTATEMENT_DAYS", "3")),
+    recent_ttl=int(os.getenv("YANDEX_DIRECT_REPORTS_TTL", "900"))
+)
+
+# API points budget: requests are paced per login, and when points run low
+# the client serves cached data instead of spending more
+limiter = UnitsLimiter(
+    requests_per_second=float(os.getenv("YANDEX_DIRECT_RPS", "5")),
+    low_units=int(os.getenv("YANDEX_DIRECT_LOW_UNITS", "1000"))
+)
+
+# One connection pool for every login served by this backend
+http_client = create_async_client(max_connections=int(os.getenv("YANDEX_DIRECT_MAX_CONNECTIONS", "20")))
+
+# Per-login clients: created on first use, reused while warm, evicted when idle.
+# Cache entries and points budgets are keyed by login and outlive eviction.
+clients = ClientRegistry(
+    lambda token, login: AsyncYandexDirectAPI(
+        access_token=token,
+        login=login,
+        is_sandbox=False,
+        http_client=http_client,
+        cache=cache,
+        store=store,
+        limiter=limiter,
+        rollups=rollups
+    ),
+    limiter=limiter,
+    idle_ttl=int(os.getenv("YANDEX_DIRECT_IDLE_TTL", "1800"))
+)
+clients.register(LOGIN, ACCESS_TOKEN)
+
+# Extra logins served with the main token (e.g. clients of an agency account)
+for client_login in filter(None, os.getenv("YANDEX_DIRECT_CLIENT_LOGINS", "").split(",")):
+    clients.register(client_login.strip(), ACCESS_TOKEN)
+
+# Logins with their own tokens: "login1:token1,login2:token2"
+for pair in filter(None, os.getenv("YANDEX_DIRECT_CLIENT_TOKENS", "").split(",")):
+    client_login, _, client_token = pair.partition(":")
+    clients.register(client_login.strip(), client_token.strip())
+
+# Async client: Direct calls are awaited instead of blocking the event loop
+client = clients.get(LOGIN)
+
+
+def get_client(login: str = None) -> AsyncYandexDirectAPI:
+    """Client for the requested login (the main login by default)"""
+    if not login or login == LOGIN:
+        return client
+    if login not in clients:
+        raise HTTPException(status_code=404, detail=f"Unknown login: {login}")
+    return clients.get(login)
+
+# Large reports are built offline by Direct; the manager polls them in the background
+report_jobs = ReportJobManager(client, max_parallel=5)
+
+# Background warmup: campaigns, yesterday's report and dashboard windows are
+# refreshed for every login before users ask, without touching the points
+# reserve. Disabled when the interval is 0 (e.g. when a separate worker runs
+# `python yandex_direct_warmup.py`).
+WARMUP_INTERVAL = float(os.getenv("YANDEX_DIRECT_WARMUP_INTERVAL", "0"))
+warmup = WarmupScheduler(
+    clients,
+    limiter,
+    interval=WARMUP_INTERVAL,
+    reserve_share=float(os.getenv("YANDEX_DIRECT_WARMUP_RESERVE", "0.3"))
 )
 
 
+# Live stats over SSE: one refresher per (login, window) shared by every
+# viewer, and only changed numbers are pushed
+events = StatsBroadcaster(
+    lambda login: get_client(login),
+    interval=float(os.getenv("YANDEX_DIRECT_EVENTS_INTERVAL", "60"))
+)
+
+
+@app.on_event("startup")
+async def start_warmup():
+    """Start the warmup scheduler if it is enabled"""
+    if WARMUP_INTERVAL > 0:
+        warmup.start()
+
+
+@app.on_event("shutdown")
+async def close_client():
+    """Close pooled Direct connections on shutdown"""
+    await warmup.stop()
+    await events.close()
+    await http_client.aclose()
+    store.close()
+
+
 @app.get("/")
 async def root():
     """Health check endpoint"""
@@ -51,38 +200,102 @@ async def root():
     }
 
 
+@app.get("/api/yandex-direct/limits")
+async def get_limits():
+    """
+    Get the last known API points budget per login and circuit breaker states
+    """
+    return {
+        "units": limiter.snapshot(),
+        "clients": clients.logins(),
+        "circuits": breakers_snapshot(),
+        "warmup": warmup.status(),
+        "events": events.status()
+    }
+
+
 @app.get("/api/yandex-direct/stats")
-async def get_stats():
+async def get_stats(login: str = None):
     """
     Get dashboard statistics
     Returns aggregated stats for the last 30 days
     """
+    api = get_client(login)
     try:
-        stats = client.get_dashboard_stats()
+        stats = await api.get_dashboard_stats()
         return stats
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/yandex-direct/dashboard")
+async def get_dashboard(days: int = Query(30, ge=1), login: str = None, fields: str = None):
+    """
+    Get campaigns, totals and per-campaign statistics in one response
+
+    Replaces the /stats + /campaigns pair: the campaign list and the report
+    are fetched once and shared between both parts.
+
+    Args:
+        days: Number of days to include (default: 30)
+        login: Advertiser login (default: YANDEX_DIRECT_LOGIN)
+        fields: Comma-separated campaign fields, e.g. Id,Name,Status,Statistics
+            (default: all fields)
+    """
+    api = get_client(login)
+    try:
+        dashboard = await api.get_dashboard(days=days, fields=fields.split(",") if fields else None)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if "error" in dashboard:
+        raise HTTPException(status_code=500, detail=dashboard["error"])
+    return dashboard
+
+
+@app.get("/api/yandex-direct/events")
+async def stream_events(days: int = Query(30, ge=1), login: str = None):
+    """
+    Stream live dashboard statistics as Server-Sent Events
+
+    The first event (`snapshot`) carries the full /dashboard payload, later
+    `stats` events carry only changed totals and campaigns. All viewers of
+    the same login and window share one background refresh, so the number
+    of open dashboards does not multiply Direct API points.
+
+    Args:
+        days: Number of days to include (default: 30)
+        login: Advertiser login (default: YANDEX_DIRECT_LOGIN)
+    """
+    get_client(login)
+    return StreamingResponse(
+        events.subscribe(login or LOGIN, days),
+        media_type="text/event-stream",
+        headers={"Cache-Control": NO_STORE, "X-Accel-Buffering": "no"}
+    )
+
+
 @app.get("/api/yandex-direct/campaigns")
-async def get_campaigns():
+async def get_campaigns(login: str = None):
     """
     Get list of campaigns
     """
+    api = get_client(login)
     try:
-        campaigns = client.get_campaigns()
+        campaigns = await api.get_campaigns()
         return {"campaigns": campaigns, "total": len(campaigns)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/api/yandex-direct/campaigns/{campaign_id}")
-async def get_campaign(campaign_id: int):
+async def get_campaign(campaign_id: int, login: str = None):
     """
     Get specific campaign by ID
     """
+    api = get_client(login)
     try:
-        campaigns = client.get_campaigns(campaign_ids=[campaign_id])
+        campaigns = await api.get_campaigns(campaign_ids=[campaign_id])
         if not campaigns:
             raise HTTPException(status_code=404, detail="Campaign not found")
         return campaigns[0]
@@ -93,68 +306,226 @@ async def get_campaign(campaign_id: int):
 
 
 @app.get("/api/yandex-direct/report")
-async def get_report(days: int = 30):
+async def get_report(
+    days: int = Query(30, ge=1),
+    login: str = None,
+    fields: str = None,
+    grain: str = None,
+    min_impressions: int = None,
+    status: str = None
+):
     """
     Get performance report
 
+    Only the requested fields are downloaded; CTR, CPC and other ratios
+    are computed from the sums. Filters are applied by the Reports service.
+
     Args:
         days: Number of days to include in report (default: 30)
+        login: Advertiser login (default: YANDEX_DIRECT_LOGIN)
+        fields: Comma-separated report fields (default: the standard set)
+        grain: Date breakdown: day, week, month, quarter, year or total
+        min_impressions: Skip rows with fewer impressions
+        status: Comma-separated campaign states, e.g. ON,SUSPENDED
     """
+    api = get_client(login)
     try:
         from datetime import datetime, timedelta
 
         date_from = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
         date_to = datetime.now().strftime("%Y-%m-%d")
 
-        report = client.get_report(date_from=date_from, date_to=date_to)
+        query = ReportQuery(
+            fields.split(",") if fields else api.REPORT_FIELDS,
+            campaign_states=status.split(",") if status else None,
+            min_impressions=min_impressions,
+            grain=grain
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        report = await api.get_report(date_from=date_from, date_to=date_to, query=query)
         return report
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/yandex-direct/summary")
+async def get_summary(days: int = Query(30, ge=1), login: str = None):
+    """
+    Get totals with per-campaign and per-day breakdowns
+
+    Args:
+        days: Number of days to include (default: 30)
+        login: Advertiser login (default: YANDEX_DIRECT_LOGIN)
+    """
+    api = get_client(login)
+    try:
+        from datetime import datetime, timedelta
+
+        date_from = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
+        date_to = datetime.now().strftime("%Y-%m-%d")
+
+        return await api.get_report_summary(date_from=date_from, date_to=date_to)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/yandex-direct/agency/clients")
+async def get_agency_clients():
+    """
+    Get clients of the agency account
+    """
+    try:
+        clients = await client.get_agency_clients()
+        return {"clients": clients, "total": len(clients)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/yandex-direct/agency/dashboard")
+async def get_agency_dashboard(days: int = Query(30, ge=1)):
+    """
+    Get aggregated stats across all agency clients
+
+    Args:
+        days: Number of days to include (default: 30)
+    """
+    try:
+        from datetime import datetime, timedelta
+
+        date_from = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
+        date_to = datetime.now().strftime("%Y-%m-%d")
+
+        return await client.get_agency_dashboard(date_from=date_from, date_to=date_to)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/api/yandex-direct/report-jobs")
+async def create_report_job(days: int = Query(30, ge=1), login: str = None):
+    """
+    Queue an offline report without waiting for it
+
+    Args:
+        days: Number of days to include in report (default: 30)
+        login: Advertiser login (default: YANDEX_DIRECT_LOGIN)
+    """
+    api = get_client(login)
+    from datetime import datetime, timedelta
+
+    date_from = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
+    date_to = datetime.now().strftime("%Y-%m-%d")
+
+    job = report_jobs.submit(date_from=date_from, date_to=date_to, client=api)
+    return job.to_dict()
+
+
+@app.get("/api/yandex-direct/report-jobs/{job_id}")
+async def get_report_job(job_id: str):
+    """
+    Get offline report status, with data once it is ready
+    """
+    job = report_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Report job not found")
+
+    response = job.to_dict()
+    if job.result is not None:
+        response["report"] = job.result
+    return response
+
+
 @app.get("/api/yandex-direct/export")
-async def export_report(days: int = 30):
+async def export_report(days: int = Query(30, ge=1), login: str = None, format: str = "csv", fields: str = None):
     """
-    Export report to CSV
+    Export report as a streamed file
+
+    Rows are written to the response as they are downloaded from Direct:
+    no temp file, and concurrent exports do not interfere.
 
     Args:
         days: Number of days to include in report (default: 30)
+        login: Advertiser login (default: YANDEX_DIRECT_LOGIN)
+        format: csv or parquet (parquet requires pyarrow)
+        fields: Comma-separated report fields (default: the standard set)
     """
-    try:
-        from fastapi.responses import FileResponse
+    api = get_client(login)
 
-        filename = client.export_to_csv()
+    if format not in export_formats():
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {format}")
 
-        if not filename:
-            raise HTTPException(status_code=500, detail="Failed to export report")
+    from datetime import datetime, timedelta
 
-        return FileResponse(
-            filename,
-            media_type="text/csv",
-            filename="yandex_direct_report.csv"
-        )
-    except HTTPException:
-        raise
+    date_from = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
+    date_to = datetime.now().strftime("%Y-%m-%d")
+
+    chunks = api.iter_export(
+        date_from=date_from,
+        date_to=date_to,
+        fields=fields.split(",") if fields else None,
+        export_format=format
+    )
+
+    # Read the first chunk before sending headers, so Direct errors
+    # still turn into a proper HTTP error instead of a truncated file
+    try:
+        first = await chunks.__anext__()
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+    async def body():
+        yield first
+        async for chunk in chunks:
+            yield chunk
+
+    return StreamingResponse(
+        body(),
+        media_type=EXPORT_WRITERS[format].media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="yandex_direct_report_{date_from}_{date_to}.{format}"'
+        }
+    )
+
 
 @app.get("/api/yandex-direct/adgroups")
-async def get_adgroups(campaign_id: int = None):
+async def get_adgroups(campaign_id: int = None, login: str = None):
     """
     Get ad groups
 
     Args:
         campaign_id: Filter by campaign ID (optional)
+        login: Advertiser login (default: YANDEX_DIRECT_LOGIN)
     """
+    api = get_client(login)
     try:
         campaign_ids = [campaign_id] if campaign_id else None
-        adgroups = client.get_adgroups(campaign_ids=campaign_ids)
+        # Large accounts span several 10,000-item pages; fetch them in parallel
+        adgroups = await api.get_adgroups(campaign_ids=campaign_ids, concurrency=3)
         return {"adgroups": adgroups, "total": len(adgroups)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/yandex-direct/snapshot")
+async def get_snapshot(campaign_id: int = None, login: str = None):
+    """
+    Get a full account snapshot: campaigns, ad groups, ads, keywords and bids
+
+    Args:
+        campaign_id: Limit the snapshot to one campaign (optional)
+        login: Advertiser login (default: YANDEX_DIRECT_LOGIN)
+    """
+    api = get_client(login)
+    try:
+        campaign_ids = [campaign_id] if campaign_id else None
+        snapshot = await api.get_account_snapshot(campaign_ids=campaign_ids)
+        return snapshot.to_dict()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 if __name__ == "__main__":
     import uvicorn
 
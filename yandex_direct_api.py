@@ -5,17 +5,145 @@ Yandex Direct API Integration
 
 import os
 import json
+import time
+import hashlib
+import threading
+from urllib.parse import urlparse
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterator, List, Dict, Optional, Tuple
 import requests
+from requests.adapters import HTTPAdapter
 
+from yandex_direct_cache import TTLCache
+from yandex_direct_export import create_writer, export_chunks
+from yandex_direct_flight import SingleFlight
+from yandex_direct_limits import NOT_ENOUGH_UNITS_ERROR, UnitsLimiter
+from yandex_direct_query import ReportQuery
+from yandex_direct_retry import CircuitBreaker, RetryPolicy, circuit_breaker
+from yandex_direct_report import MetricTotals, ReportAggregator, iter_tsv_chunks
+from yandex_direct_rollup import ReportRollup, RollupStore
+from yandex_direct_snapshot import AccountSnapshot
+from yandex_direct_store import ReportStore
 
-class YandexDirectAPI:
+
+class YandexDirectError(Exception):
     """
-    Класс для работы с Yandex Direct API v5
+    Ошибка API, которую нельзя вернуть словарём
+    (например, при потоковом чтении отчёта)
+    """
+
+    def __init__(self, error: str, message: Optional[str] = None, status: Optional[str] = None):
+        super().__init__(error)
+        self.error = error
+        self.message = message
+        self.status = status
+
+    def to_dict(self) -> Dict:
+        """Ошибка в формате {"error": ...}, как у остальных методов клиента"""
+        result = {"error": self.error}
+        if self.message is not None:
+            result["message"] = self.message
+        if self.status is not None:
+            result["status"] = self.status
+        return result
+
+
+def create_session(pool_connections: int = 10, pool_maxsize: int = 10) -> requests.Session:
+    """
+    Создать HTTP-сессию с пулом keep-alive соединений
+
+    Args:
+        pool_connections: Количество пулов (по одному на хост)
+        pool_maxsize: Максимум соединений в пуле одного хоста
+
+    Returns:
+        Сессия requests, которую можно разделять между клиентами
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+    session.mount("https://", adapter)
+    session.headers.update({
+        "Accept-Encoding": "gzip, deflate",
+        "Connection": "keep-alive"
+    })
+    return session
+
+
+class BaseYandexDirectAPI:
+    """
+    Общая часть синхронного и асинхронного клиентов:
+    URL, заголовки, сборка параметров запросов и разбор ответов.
+    Сетевой ввод-вывод реализуют наследники.
     """
 
-    def __init__(self, access_token: str, login: str, is_sandbox: bool = False):
+    CAMPAIGN_FIELDS = [
+        "Id", "Name", "Status", "State", "StatusPayment",
+        "StatusClarification", "StartDate", "EndDate",
+        "DailyBudget", "Currency", "Funds"
+    ]
+
+    ADGROUP_FIELDS = [
+        "Id", "Name", "CampaignId", "Status", "Type",
+        "Subtype", "TrackingParams"
+    ]
+
+    AD_FIELDS = [
+        "Id", "AdGroupId", "CampaignId", "Status", "State", "Type", "Subtype"
+    ]
+
+    TEXT_AD_FIELDS = ["Title", "Title2", "Text", "Href", "DisplayDomain"]
+
+    KEYWORD_FIELDS = [
+        "Id", "Keyword", "AdGroupId", "CampaignId", "Status", "State", "ServingStatus"
+    ]
+
+    BID_FIELDS = ["KeywordId", "AdGroupId", "CampaignId", "Bid", "ContextBid"]
+
+    AGENCY_CLIENT_FIELDS = ["Login", "ClientId", "ClientInfo"]
+
+    REPORT_FIELDS = [
+        "CampaignId", "CampaignName", "Date",
+        "Impressions", "Clicks", "Cost", "Ctr",
+        "AvgCpc", "Conversions", "ConversionRate", "CostPerConversion"
+    ]
+
+    # Поля, которых достаточно для итогов и разбивок ReportAggregator
+    AGGREGATE_FIELDS = [
+        "CampaignId", "CampaignName", "Date",
+        "Impressions", "Clicks", "Cost", "Conversions"
+    ]
+
+    # Максимальный размер страницы get-методов
+    PAGE_LIMIT = 10000
+
+    # Максимум CampaignIds в SelectionCriteria adgroups/ads/keywords/bids
+    CAMPAIGN_IDS_LIMIT = 10
+
+    # Таймауты запросов к API, секунды: лучше быстро повторить запрос,
+    # чем держать поток минуту на зависшем соединении
+    CONNECT_TIMEOUT = 5
+    REQUEST_TIMEOUT = 30
+
+    # Reports: 201 - отчёт поставлен в очередь, 202 - ещё формируется
+    REPORT_PENDING_STATUSES = (201, 202)
+    REPORT_MAX_RETRY_DELAY = 60
+
+    # Размер блока при чтении тела отчёта
+    REPORT_CHUNK_SIZE = 64 * 1024
+
+    def __init__(
+        self,
+        access_token: str,
+        login: str,
+        is_sandbox: bool = False,
+        cache: Optional[TTLCache] = None,
+        store: Optional[ReportStore] = None,
+        limiter: Optional[UnitsLimiter] = None,
+        retry: Optional[RetryPolicy] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        rollups: Optional[RollupStore] = None
+    ):
         """
         Инициализация клиента Yandex Direct API
 
@@ -23,14 +151,28 @@ class YandexDirectAPI:
             access_token: OAuth токен доступа
             login: Логин клиента в Яндекс.Директ
             is_sandbox: Использовать sandbox режим (для тестирования)
+            cache: Кэш ответов (если None - запросы не кэшируются)
+            store: Хранилище отчётов по дням (если None - каждый отчёт
+                выгружается целиком)
+            limiter: Лимитер запросов с учётом баллов (если None - без ограничений)
+            retry: Политика повторов get-запросов (если None - по умолчанию)
+            breaker: Circuit breaker (если None - общий для хоста API)
+            rollups: Предрасчитанные итоги по кампаниям и дням (если None -
+                итоги каждый раз считаются по строкам отчёта)
         """
         self.access_token = access_token
         self.login = login
         self.is_sandbox = is_sandbox
+        self.cache = cache
+        self.store = store
+        self.limiter = limiter
+        self.rollups = rollups
+        self.retry = retry or RetryPolicy()
 
         # API URLs
         self.api_url = "https://api-sandbox.direct.yandex.com/json/v5/" if is_sandbox else "https://api.direct.yandex.com/json/v5/"
-        self.reports_url = "https://api-sandbox.direct.yandex.com/v4/json/" if is_sandbox else "https://api.direct.yandex.ru/reports/"
+        self.reports_url = f"{self.api_url}reports"
+        self.breaker = breaker or circuit_breaker(urlparse(self.api_url).netloc)
 
         # Headers
         self.headers = {
@@ -40,10 +182,493 @@ class YandexDirectAPI:
             "Content-Type": "application/json; charset=utf-8"
         }
 
+    # ===== REQUEST BUILDERS (Сборка запросов) =====
+
+    def _campaigns_params(self, campaign_ids: Optional[List[int]] = None, states: Optional[List[str]] = None) -> Dict:
+        """Параметры campaigns.get"""
+        params = {
+            "SelectionCriteria": {},
+            "FieldNames": list(self.CAMPAIGN_FIELDS)
+        }
+
+        if campaign_ids:
+            params["SelectionCriteria"]["Ids"] = campaign_ids
+        if states:
+            params["SelectionCriteria"]["States"] = states
+
+        return params
+
+    def _adgroups_params(self, campaign_ids: Optional[List[int]] = None) -> Dict:
+        """Параметры adgroups.get"""
+        params = {
+            "SelectionCriteria": {},
+            "FieldNames": list(self.ADGROUP_FIELDS)
+        }
+
+        if campaign_ids:
+            params["SelectionCriteria"]["CampaignIds"] = campaign_ids
+
+        return params
+
+    def _ads_params(self, campaign_ids: List[int]) -> Dict:
+        """Параметры ads.get"""
+        return {
+            "SelectionCriteria": {"CampaignIds": campaign_ids},
+            "FieldNames": list(self.AD_FIELDS),
+            "TextAdFieldNames": list(self.TEXT_AD_FIELDS)
+        }
+
+    def _keywords_params(self, campaign_ids: List[int]) -> Dict:
+        """Параметры keywords.get"""
+        return {
+            "SelectionCriteria": {"CampaignIds": campaign_ids},
+            "FieldNames": list(self.KEYWORD_FIELDS)
+        }
+
+    def _bids_params(self, campaign_ids: List[int]) -> Dict:
+        """Параметры bids.get"""
+        return {
+            "SelectionCriteria": {"CampaignIds": campaign_ids},
+            "FieldNames": list(self.BID_FIELDS)
+        }
+
+    def _agency_clients_params(self) -> Dict:
+        """Параметры agencyclients.get"""
+        return {
+            "SelectionCriteria": {},
+            "FieldNames": list(self.AGENCY_CLIENT_FIELDS)
+        }
+
+    def _snapshot_requests(self, campaign_ids: List[int]) -> List[Tuple[str, Dict, str]]:
+        """
+        Запросы для снимка аккаунта
+
+        Каждый сервис запрашивается по пачкам из CAMPAIGN_IDS_LIMIT кампаний -
+        запросы независимы и могут выполняться параллельно.
+
+        Returns:
+            Список (сервис, параметры, ключ результата)
+        """
+        builders = (
+            ("adgroups", self._adgroups_params, "AdGroups"),
+            ("ads", self._ads_params, "Ads"),
+            ("keywords", self._keywords_params, "Keywords"),
+            ("bids", self._bids_params, "Bids")
+        )
+        limit = self.CAMPAIGN_IDS_LIMIT
+        chunks = [campaign_ids[i:i + limit] for i in range(0, len(campaign_ids), limit)]
+        return [
+            (service, build(chunk), result_key)
+            for chunk in chunks
+            for service, build, result_key in builders
+        ]
+
+    @staticmethod
+    def _page_params(params: Dict, offset: int, limit: int) -> Dict:
+        """Параметры get-запроса для страницы, начиная с offset"""
+        return {**params, "Page": {"Limit": limit, "Offset": offset}}
+
+    @staticmethod
+    def _page_result(response: Dict, result_key: str):
+        """
+        Объекты страницы и смещение следующей
+
+        Returns:
+            (объекты, LimitedBy или None, если страница последняя)
+
+        Raises:
+            YandexDirectError: API вернул ошибку
+        """
+        if "result" not in response:
+            raise YandexDirectError(str(response.get("error")))
+        result = response["result"]
+        return result.get(result_key, []), result.get("LimitedBy")
+
+    @staticmethod
+    def report_period(days: int = 30) -> Tuple[str, str]:
+        """
+        Период последних `days` дней в формате (date_from, date_to)
+
+        Тот же период, что клиент берёт по умолчанию (например, для окон
+        дашборда в прогреве и serverless-функциях).
+        """
+        date_from = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
+        date_to = datetime.now().strftime("%Y-%m-%d")
+        return date_from, date_to
+
+    @classmethod
+    def _resolve_period(cls, date_from: Optional[str], date_to: Optional[str]):
+        """Подставить последние 30 дней вместо незаданных дат"""
+        default_from, default_to = cls.report_period()
+        return date_from or default_from, date_to or default_to
+
+    def _report_query(
+        self,
+        campaign_ids: Optional[List[int]] = None,
+        fields: Optional[List[str]] = None,
+        query: Optional[ReportQuery] = None
+    ) -> ReportQuery:
+        """Запрос отчёта: готовый query или поля и кампании"""
+        if query is not None:
+            return query
+        return ReportQuery(fields or self.REPORT_FIELDS, campaign_ids=campaign_ids)
+
+    def _report_params(self, query: ReportQuery, date_from: str, date_to: str) -> Dict:
+        """Тело запроса к сервису Reports"""
+        params = query.to_params(date_from, date_to)
+
+        # Имя отчёта должно быть уникальным для набора параметров:
+        # по нему Reports находит уже поставленный в очередь отчёт
+        digest = hashlib.md5(json.dumps(params, sort_keys=True).encode()).hexdigest()[:12]
+        params["ReportName"] = f"Report_{date_from}_{date_to}_{digest}"
+
+        return {"params": params}
+
+    def _report_headers(self, processing_mode: str = "auto") -> Dict:
+        """
+        Заголовки для сервиса Reports
+
+        Args:
+            processing_mode: auto, online или offline
+        """
+        # Reports endpoint отличается
+        headers = self.headers.copy()
+        headers["processingMode"] = processing_mode
+        headers["returnMoneyInMicros"] = "false"
+        headers["skipReportHeader"] = "true"
+        headers["skipReportSummary"] = "true"
+        # Отчёт приходит сжатым, HTTP-клиент распаковывает его потоком
+        headers["Accept-Encoding"] = "gzip"
+        return headers
+
+    def _report_retry_delay(self, response_headers, attempt: int) -> float:
+        """
+        Через сколько секунд повторить запрос отчёта
+
+        Reports присылает рекомендацию в заголовке retryIn;
+        без неё используем экспоненциальную задержку.
+        """
+        retry_in = response_headers.get("retryIn")
+        if retry_in:
+            try:
+                return min(float(retry_in), self.REPORT_MAX_RETRY_DELAY)
+            except ValueError:
+                pass
+        return min(2 ** attempt, self.REPORT_MAX_RETRY_DELAY)
+
+    # ===== CACHE (Кэш) =====
+
+    def _cache_key(self, resource: str, params: Any) -> str:
+        return TTLCache.make_key(self.login, resource, params)
+
+    @staticmethod
+    def _is_cacheable(value: Any) -> bool:
+        """Ошибки не кэшируем"""
+        return not (isinstance(value, dict) and "error" in value)
+
+    # ===== UNITS (Баллы API) =====
+
+    def _rate_delay(self) -> float:
+        """Сколько подождать перед запросом по лимиту частоты"""
+        return self.limiter.reserve(self.login) if self.limiter is not None else 0.0
+
+    def _track_units(self, response_headers, data: Any = None):
+        """Учесть баллы из заголовка Units и ошибку 152 (недостаточно баллов)"""
+        if self.limiter is None:
+            return
+
+        login = response_headers.get("Units-Used-Login") or self.login
+        self.limiter.update(login, response_headers.get("Units"))
+
+        error = data.get("error") if isinstance(data, dict) else None
+        if isinstance(error, dict) and str(error.get("error_code")) == str(NOT_ENOUGH_UNITS_ERROR):
+            self.limiter.exhaust(login)
+
+    def _attempts(self, method: str) -> int:
+        """Повторяем только идемпотентные get-запросы"""
+        return self.retry.max_attempts if method == "get" else 1
+
+    def _circuit_open_error(self) -> Dict:
+        return {"error": "Direct API is unavailable (circuit open)", "status": "unavailable"}
+
+    def _record_attempt(self, status: Optional[int]):
+        """Отметить результат попытки в circuit breaker"""
+        if self.retry.is_host_failure(status):
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    @staticmethod
+    def _error_response(status: int, reason: str, data: Any) -> Dict:
+        """Ответ с HTTP-ошибкой: ошибка Direct из тела или статус"""
+        if isinstance(data, dict) and "error" in data:
+            return data
+        return {"error": f"{status} {reason}", "status": "failed"}
+
+    def _is_budget_low(self) -> bool:
+        """Баллов мало: новые запросы заменяем данными из кэша"""
+        return self.limiter is not None and self.limiter.is_low(self.login)
+
+    def _uses_store(self, query: ReportQuery) -> bool:
+        """Отчёт можно собирать из хранилища, только если в нём есть разбивка по дням"""
+        return self.store is not None and query.has_day_grain
+
+    @staticmethod
+    def _store_key(query: ReportQuery) -> str:
+        """Ключ набора строк запроса в ReportStore"""
+        return ReportStore.report_key(query.api_fields, query.campaign_ids, query.store_filters())
+
+    def _uses_rollup(self, query: ReportQuery) -> bool:
+        """Строки отчёта можно собрать из предрасчитанных итогов"""
+        return self.rollups is not None and ReportRollup.answers(query)
+
+    def _rollup_ranges(self, rollup: ReportRollup, date_from: str, date_to: str) -> List[Tuple[str, str]]:
+        """Диапазоны для догрузки в rollup (если баллов мало - только незагруженные)"""
+        ranges = rollup.missing_ranges(date_from, date_to)
+        if self._is_budget_low():
+            ranges = [(start, end) for start, end in ranges if not rollup.covers(start, end)]
+        return ranges
+
+    # ===== RESPONSE PARSERS (Разбор ответов) =====
+
+    @staticmethod
+    def _report_result(data: List[Dict], date_from: str, date_to: str) -> Dict:
+        """Ответ get_report"""
+        return {
+            "data": data,
+            "total": len(data),
+            "date_from": date_from,
+            "date_to": date_to
+        }
+
+    @staticmethod
+    def _empty_dashboard_stats() -> Dict:
+        """Статистика дашборда, когда данных нет"""
+        return {
+            "total_impressions": 0,
+            "total_clicks": 0,
+            "total_cost": 0,
+            "avg_ctr": 0,
+            "avg_cpc": 0,
+            "total_conversions": 0,
+            "conversion_rate": 0,
+            "campaigns_count": 0
+        }
+
+    @classmethod
+    def _dashboard_stats(cls, aggregator: ReportAggregator, date_from: str, date_to: str) -> Dict:
+        """Статистика для дашборда по результату агрегации"""
+        if not aggregator.by_campaign:
+            return cls._empty_dashboard_stats()
+        return aggregator.dashboard_stats(date_from, date_to)
+
+    @classmethod
+    def _agency_dashboard(cls, results: List[Tuple], date_from: str, date_to: str) -> Dict:
+        """
+        Сводный дашборд агентства
+
+        Args:
+            results: Список (клиент, кампании, ReportAggregator или None, ошибка или None)
+        """
+        merged = ReportAggregator()
+        clients = []
+        campaign_logins = {}
+
+        for client, campaigns, aggregator, error in results:
+            login = client.get("Login")
+            entry = {
+                "login": login,
+                "client_id": client.get("ClientId"),
+                "client_info": client.get("ClientInfo"),
+                "campaigns_count": len(campaigns)
+            }
+            if aggregator is not None:
+                merged.merge(aggregator)
+                entry.update(aggregator.totals.to_dict())
+                campaign_logins.update((campaign_id, login) for campaign_id in aggregator.by_campaign)
+            if error is not None:
+                entry["error"] = error
+            clients.append(entry)
+
+        clients.sort(key=lambda entry: entry.get("cost", 0), reverse=True)
+        campaigns = [
+            {**campaign, "login": campaign_logins.get(campaign["id"])}
+            for campaign in merged.campaigns()
+        ]
+
+        return {
+            "totals": cls._dashboard_stats(merged, date_from, date_to),
+            "clients": clients,
+            "campaigns": campaigns,
+            "daily": merged.days(),
+            "date_from": date_from,
+            "date_to": date_to
+        }
+
+    @staticmethod
+    def _campaign_statistics(totals: MetricTotals) -> Dict:
+        """Показатели кампании в формате Statistics"""
+        return {
+            "Impressions": totals.impressions,
+            "Clicks": totals.clicks,
+            "Ctr": round(totals.ctr, 2),
+            "Cost": round(totals.cost, 2),
+            "AvgCpc": round(totals.avg_cpc, 2),
+            "Conversions": totals.conversions,
+            "ConversionRate": round(totals.conversion_rate, 2)
+        }
+
+    @classmethod
+    def _dashboard(
+        cls,
+        campaigns: List[Dict],
+        aggregator: ReportAggregator,
+        date_from: str,
+        date_to: str,
+        fields: Optional[List[str]] = None
+    ) -> Dict:
+        """
+        Дашборд: итоги и кампании с показателями за период
+
+        Args:
+            campaigns: Кампании из campaigns.get
+            aggregator: Итоги отчёта за период
+            fields: Поля кампаний в ответе (Statistics - показатели); None - все
+        """
+        totals = cls._dashboard_stats(aggregator, date_from, date_to)
+        totals["campaigns_count"] = len(campaigns)
+
+        rows = []
+        for campaign in campaigns:
+            statistics = aggregator.by_campaign.get(campaign.get("Id")) or MetricTotals()
+            row = {**campaign, "Statistics": cls._campaign_statistics(statistics)}
+            if fields:
+                row = {field: row[field] for field in fields if field in row}
+            rows.append(row)
+
+        return {
+            "totals": totals,
+            "campaigns": rows,
+            "date_from": date_from,
+            "date_to": date_to
+        }
+
+
+class YandexDirectAPI(BaseYandexDirectAPI):
+    """
+    Класс для работы с Yandex Direct API v5
+    """
+
+    def __init__(
+        self,
+        access_token: str,
+        login: str,
+        is_sandbox: bool = False,
+        session: Optional[requests.Session] = None,
+        pool_connections: int = 10,
+        pool_maxsize: int = 10,
+        cache: Optional[TTLCache] = None,
+        store: Optional[ReportStore] = None,
+        limiter: Optional[UnitsLimiter] = None,
+        retry: Optional[RetryPolicy] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        flight: Optional[SingleFlight] = None,
+        rollups: Optional[RollupStore] = None
+    ):
+        """
+        Инициализация клиента Yandex Direct API
+
+        Args:
+            access_token: OAuth токен доступа
+            login: Логин клиента в Яндекс.Директ
+            is_sandbox: Использовать sandbox режим (для тестирования)
+            session: Готовая HTTP-сессия (если None - создаётся своя)
+            pool_connections: Количество пулов соединений для своей сессии
+            pool_maxsize: Максимум keep-alive соединений на хост
+            cache: Кэш ответов (если None - запросы не кэшируются)
+            store: Хранилище отчётов по дням (если None - каждый отчёт
+                выгружается целиком)
+            limiter: Лимитер запросов с учётом баллов (если None - без ограничений)
+            retry: Политика повторов get-запросов (если None - по умолчанию)
+            breaker: Circuit breaker (если None - общий для хоста API)
+            flight: Группа объединения одинаковых одновременных запросов
+                (если None - своя у клиента)
+            rollups: Предрасчитанные итоги по кампаниям и дням (если None -
+                итоги каждый раз считаются по строкам отчёта)
+        """
+        super().__init__(access_token, login, is_sandbox, cache, store, limiter, retry, breaker, rollups)
+        self.flight = flight or SingleFlight()
+
+        # Пул соединений: переиспользуем TCP+TLS между запросами
+        self._owns_session = session is None
+        self.session = session or create_session(pool_connections, pool_maxsize)
+
+    def close(self):
+        """Закрыть собственную HTTP-сессию (чужую сессию не трогаем)"""
+        if self._owns_session:
+            self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _cached(self, resource: str, params: Any, fetch: Callable[[], Any]) -> Any:
+        """
+        Взять значение из кэша или получить его через fetch()
+
+        Устаревшая запись отдаётся сразу, а обновление запускается
+        в фоновом потоке (не больше одного на ключ). Если баллов мало
+        или запрос завершился ошибкой, отдаётся любое сохранённое значение.
+        Одинаковые одновременные запросы выполняются один раз.
+        """
+        key = self._cache_key(resource, params)
+        if self.cache is None:
+            return self.flight.do(key, fetch)
+
+        entry = self.cache.lookup(key)
+        budget_low = self._is_budget_low()
+
+        if entry is not None:
+            if not entry.is_fresh and not budget_low and self.cache.begin_refresh(key):
+                threading.Thread(
+                    target=self._refresh_cached,
+                    args=(resource, key, fetch),
+                    daemon=True
+                ).start()
+            return entry.value
+
+        fallback = self.cache.peek(key)
+        if budget_low and fallback is not None:
+            return fallback
+
+        value = self.flight.do(key, fetch)
+        if self._is_cacheable(value):
+            self.cache.set(resource, key, value)
+        elif fallback is not None:
+            return fallback
+        return value
+
+    def _refresh_cached(self, resource: str, key: str, fetch: Callable[[], Any]):
+        """Фоновое обновление записи кэша"""
+        try:
+            value = self.flight.do(key, fetch)
+        except Exception as e:
+            print(f"Error refreshing {resource}: {e}")
+            value = {"error": str(e)}
+
+        if self._is_cacheable(value):
+            self.cache.set(resource, key, value)
+        else:
+            self.cache.end_refresh(key)
+
     def _make_request(self, service: str, method: str, params: Dict) -> Dict:
         """
         Выполнить запрос к API
 
+        Ответы на get-запросы кэшируются, если у клиента задан кэш.
+
         Args:
             service: Название сервиса (campaigns, adgroups, ads, etc.)
             method: Метод API (get, add, update, delete)
@@ -52,6 +677,17 @@ class YandexDirectAPI:
         Returns:
             Ответ от API
         """
+        if method == "get":
+            return self._cached(service, params, lambda: self._send_request(service, method, params))
+        return self._send_request(service, method, params)
+
+    def _send_request(self, service: str, method: str, params: Dict) -> Dict:
+        """
+        Отправить запрос к API без кэша
+
+        get-запросы повторяются при сетевых ошибках, 5xx и временных
+        ошибках Direct; пока circuit breaker открыт, запрос не отправляется.
+        """
         url = f"{self.api_url}{service}"
 
         payload = {
@@ -59,43 +695,105 @@ class YandexDirectAPI:
             "params": params
         }
 
+        attempts = self._attempts(method)
+        for attempt in range(attempts):
+            if not self.breaker.allow():
+                return self._circuit_open_error()
+
+            time.sleep(self._rate_delay())
+            data, status = self._post_once(url, payload)
+            self._record_attempt(status)
+
+            if "error" not in data or attempt == attempts - 1 or not self.retry.should_retry(status, data):
+                return data
+            time.sleep(self.retry.delay(attempt))
+
+    def _post_once(self, url: str, payload: Dict):
+        """
+        Одна попытка запроса
+
+        Returns:
+            (ответ, HTTP-статус или None при сетевой ошибке)
+        """
         try:
-            response = requests.post(url, headers=self.headers, json=payload, timeout=60)
-            response.raise_for_status()
-            return response.json()
+            response = self.session.post(
+                url,
+                headers=self.headers,
+                json=payload,
+                timeout=(self.CONNECT_TIMEOUT, self.REQUEST_TIMEOUT)
+            )
         except requests.exceptions.RequestException as e:
-            return {"error": str(e), "status": "failed"}
+            return {"error": str(e), "status": "failed"}, None
+
+        try:
+            data = response.json()
+        except ValueError:
+            data = None
+
+        if response.status_code >= 400:
+            data = self._error_response(response.status_code, response.reason, data)
+        elif not isinstance(data, dict):
+            data = {"error": "Invalid JSON response", "status": "failed"}
+
+        self._track_units(response.headers, data)
+        return data, response.status_code
+
+    def _iter_pages(self, service: str, params: Dict, result_key: str, page_size: Optional[int] = None) -> Iterator[Dict]:
+        """
+        Лениво обойти все страницы get-метода
+
+        Следующая страница запрашивается, только если API вернул LimitedBy.
+
+        Raises:
+            YandexDirectError: API вернул ошибку
+        """
+        page_size = page_size or self.PAGE_LIMIT
+        offset = 0
+
+        while True:
+            response = self._make_request(service, "get", self._page_params(params, offset, page_size))
+            items, limited_by = self._page_result(response, result_key)
+            yield from items
+
+            if limited_by is None:
+                return
+            offset = limited_by
 
     # ===== CAMPAIGNS (Кампании) =====
 
-    def get_campaigns(self, campaign_ids: Optional[List[int]] = None) -> List[Dict]:
+    def iter_campaigns(
+        self,
+        campaign_ids: Optional[List[int]] = None,
+        page_size: Optional[int] = None,
+        states: Optional[List[str]] = None
+    ) -> Iterator[Dict]:
         """
-        Получить список кампаний
+        Лениво перебрать кампании по страницам
 
         Args:
             campaign_ids: Список ID кампаний (если None - все кампании)
+            page_size: Размер страницы (по умолчанию максимальный)
+            states: Только кампании в этих состояниях (ON, SUSPENDED, ...)
 
-        Returns:
-            Список кампаний с параметрами
+        Raises:
+            YandexDirectError: API вернул ошибку
         """
-        params = {
-            "SelectionCriteria": {},
-            "FieldNames": [
-                "Id", "Name", "Status", "State", "StatusPayment",
-                "StatusClarification", "StartDate", "EndDate",
-                "DailyBudget", "Currency", "Funds"
-            ]
-        }
+        return self._iter_pages("campaigns", self._campaigns_params(campaign_ids, states), "Campaigns", page_size)
 
-        if campaign_ids:
-            params["SelectionCriteria"]["Ids"] = campaign_ids
+    def get_campaigns(self, campaign_ids: Optional[List[int]] = None) -> List[Dict]:
+        """
+        Получить список кампаний (все страницы)
 
-        response = self._make_request("campaigns", "get", params)
+        Args:
+            campaign_ids: Список ID кампаний (если None - все кампании)
 
-        if "result" in response:
-            return response["result"].get("Campaigns", [])
-        else:
-            print(f"Error getting campaigns: {response.get('error')}")
+        Returns:
+            Список кампаний с параметрами
+        """
+        try:
+            return list(self.iter_campaigns(campaign_ids))
+        except YandexDirectError as e:
+            print(f"Error getting campaigns: {e}")
             return []
 
     def get_campaign_stats(self, campaign_id: int, date_from: str, date_to: str) -> Dict:
@@ -119,9 +817,22 @@ class YandexDirectAPI:
 
     # ===== AD GROUPS (Группы объявлений) =====
 
+    def iter_adgroups(self, campaign_ids: Optional[List[int]] = None, page_size: Optional[int] = None) -> Iterator[Dict]:
+        """
+        Лениво перебрать группы объявлений по страницам
+
+        Args:
+            campaign_ids: Список ID кампаний
+            page_size: Размер страницы (по умолчанию максимальный)
+
+        Raises:
+            YandexDirectError: API вернул ошибку
+        """
+        return self._iter_pages("adgroups", self._adgroups_params(campaign_ids), "AdGroups", page_size)
+
     def get_adgroups(self, campaign_ids: Optional[List[int]] = None) -> List[Dict]:
         """
-        Получить группы объявлений
+        Получить группы объявлений (все страницы)
 
         Args:
             campaign_ids: Список ID кампаний
@@ -129,33 +840,368 @@ class YandexDirectAPI:
         Returns:
             Список групп объявлений
         """
-        params = {
-            "SelectionCriteria": {},
-            "FieldNames": [
-                "Id", "Name", "CampaignId", "Status", "Type",
-                "Subtype", "TrackingParams"
-            ]
-        }
+        try:
+            return list(self.iter_adgroups(campaign_ids))
+        except YandexDirectError as e:
+            print(f"Error getting ad groups: {e}")
+            return []
 
-        if campaign_ids:
-            params["SelectionCriteria"]["CampaignIds"] = campaign_ids
+    # ===== AGENCY (Агентский аккаунт) =====
 
-        response = self._make_request("adgroups", "get", params)
+    def for_client(self, login: str) -> "YandexDirectAPI":
+        """
+        Клиент для логина клиента агентства
 
-        if "result" in response:
-            return response["result"].get("AdGroups", [])
-        else:
-            print(f"Error getting ad groups: {response.get('error')}")
+        Использует ту же сессию, кэш, хранилище, rollup'ы и лимитер,
+        а в заголовке Client-Login передаёт логин клиента.
+        """
+        return YandexDirectAPI(
+            self.access_token,
+            login,
+            self.is_sandbox,
+            session=self.session,
+            cache=self.cache,
+            store=self.store,
+            limiter=self.limiter,
+            retry=self.retry,
+            breaker=self.breaker,
+            flight=self.flight,
+            rollups=self.rollups
+        )
+
+    def iter_agency_clients(self) -> Iterator[Dict]:
+        """
+        Лениво перебрать клиентов агентства
+
+        Raises:
+            YandexDirectError: API вернул ошибку (например, аккаунт не агентский)
+        """
+        return self._iter_pages("agencyclients", self._agency_clients_params(), "Clients")
+
+    def get_agency_clients(self) -> List[Dict]:
+        """
+        Получить клиентов агентства
+
+        Returns:
+            Список клиентов (Login, ClientId, ClientInfo)
+        """
+        try:
+            return list(self.iter_agency_clients())
+        except YandexDirectError as e:
+            print(f"Error getting agency clients: {e}")
             return []
 
+    def get_agency_dashboard(
+        self,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        max_workers: int = 5
+    ) -> Dict:
+        """
+        Сводная статистика по всем клиентам агентства
+
+        Кампании и отчёты клиентов запрашиваются параллельно
+        в пуле из max_workers потоков.
+
+        Args:
+            date_from: Дата начала (YYYY-MM-DD)
+            date_to: Дата окончания (YYYY-MM-DD)
+            max_workers: Сколько клиентов обрабатывать параллельно
+
+        Returns:
+            Словарь totals / clients / campaigns / daily
+        """
+        date_from, date_to = self._resolve_period(date_from, date_to)
+
+        def load(client: Dict):
+            api = self.for_client(client["Login"])
+            try:
+                campaigns = list(api.iter_campaigns())
+                return client, campaigns, api.aggregate_report(None, date_from, date_to), None
+            except Exception as e:
+                print(f"Error getting stats for {client['Login']}: {e}")
+                return client, [], None, str(e)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            results = list(pool.map(load, self.get_agency_clients()))
+
+        return self._agency_dashboard(results, date_from, date_to)
+
+    # ===== ACCOUNT SNAPSHOT (Снимок аккаунта) =====
+
+    def get_account_snapshot(self, campaign_ids: Optional[List[int]] = None, max_workers: int = 4) -> AccountSnapshot:
+        """
+        Загрузить кампании, группы, объявления, ключевые фразы и ставки
+
+        Сначала запрашиваются кампании, затем остальные сервисы
+        по пачкам кампаний в пуле из max_workers потоков.
+
+        Args:
+            campaign_ids: Список ID кампаний (если None - все кампании)
+            max_workers: Сколько запросов выполнять параллельно
+
+        Returns:
+            AccountSnapshot; ошибки отдельных запросов - в snapshot.errors
+        """
+        snapshot = AccountSnapshot(self.login)
+
+        try:
+            snapshot.add("campaigns", self.iter_campaigns(campaign_ids))
+        except YandexDirectError as e:
+            print(f"Error getting campaigns: {e}")
+            snapshot.add_error("campaigns", str(e))
+            return snapshot
+
+        def fetch(request):
+            service, params, result_key = request
+            try:
+                return service, list(self._iter_pages(service, params, result_key)), None
+            except YandexDirectError as e:
+                return service, [], str(e)
+
+        requests_ = self._snapshot_requests(list(snapshot.campaigns))
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            for service, items, error in pool.map(fetch, requests_):
+                if error is not None:
+                    print(f"Error getting {service}: {error}")
+                    snapshot.add_error(service, error)
+                snapshot.add(service, items)
+
+        return snapshot
+
     # ===== REPORTS (Отчёты) =====
 
+    def _resolve_query(self, query: ReportQuery) -> ReportQuery:
+        """
+        Заменить фильтр по состояниям кампаний списком ID
+
+        Reports не фильтрует по состоянию кампании, поэтому
+        подходящие кампании сначала выбираются через campaigns.get.
+        """
+        if not query.campaign_states:
+            return query
+        campaigns = self.iter_campaigns(query.campaign_ids, states=query.campaign_states)
+        return query.restrict([campaign["Id"] for campaign in campaigns])
+
+    def _iter_report_chunks(
+        self,
+        query: ReportQuery,
+        date_from: Optional[str],
+        date_to: Optional[str],
+        processing_mode: str,
+        max_wait: float
+    ) -> Iterator[bytes]:
+        """
+        Байтовые блоки TSV ответа Reports по мере загрузки (уже распакованные)
+
+        Если Reports ставит отчёт в очередь (201/202), запрос
+        повторяется через retryIn секунд.
+
+        Raises:
+            YandexDirectError: Reports вернул ошибку или отчёт не готов
+        """
+        # Если даты не указаны - последние 30 дней
+        default_from, default_to = self.report_period()
+        date_from = date_from or default_from
+        date_to = date_to or default_to
+
+        params = self._report_params(query, date_from, date_to)
+        headers = self._report_headers(processing_mode)
+        deadline = time.monotonic() + max_wait
+        attempt = 0
+
+        failures = 0
+
+        while True:
+            if not self.breaker.allow():
+                raise YandexDirectError(self._circuit_open_error()["error"], status="unavailable")
+
+            time.sleep(self._rate_delay())
+            try:
+                response = self.session.post(
+                    self.reports_url,
+                    headers=headers,
+                    json=params,
+                    timeout=(self.CONNECT_TIMEOUT, 120),
+                    stream=True
+                )
+            except requests.exceptions.RequestException as e:
+                # Сетевая ошибка или таймаут - сбой хоста, повторяем как в _send_request
+                self._record_attempt(None)
+                if failures + 1 >= self.retry.max_attempts:
+                    raise YandexDirectError(str(e), status="failed")
+                time.sleep(self.retry.delay(failures))
+                failures += 1
+                continue
+
+            with response:
+                self._record_attempt(response.status_code)
+
+                if response.status_code == 200:
+                    # Обрыв уже отданного потока не повторяем: часть строк прочитана
+                    try:
+                        yield from response.iter_content(chunk_size=self.REPORT_CHUNK_SIZE)
+                    except requests.exceptions.RequestException as e:
+                        raise YandexDirectError(str(e), status="failed")
+                    return
+
+                if response.status_code in self.REPORT_PENDING_STATUSES:
+                    # Отчёт формируется в офлайне - ждём и повторяем
+                    delay = self._report_retry_delay(response.headers, attempt)
+                elif response.status_code in self.retry.retry_statuses and failures + 1 < self.retry.max_attempts:
+                    # Временный сбой Reports - повторяем с задержкой
+                    delay = self.retry.delay(failures)
+                    failures += 1
+                else:
+                    raise YandexDirectError(f"Status {response.status_code}", response.text)
+
+            if time.monotonic() + delay > deadline:
+                raise YandexDirectError("Report is not ready", status="pending")
+            time.sleep(delay)
+            attempt += 1
+
+    def iter_report(
+        self,
+        campaign_ids: Optional[List[int]] = None,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+        processing_mode: str = "auto",
+        max_wait: float = 600,
+        query: Optional[ReportQuery] = None
+    ) -> Iterator[Dict]:
+        """
+        Потоково читать отчёт по статистике
+
+        Строки разбираются по мере загрузки ответа, поэтому память
+        не растёт с размером отчёта. Если задано хранилище и в полях
+        есть Date, у Direct запрашиваются только недостающие дни.
+
+        Args:
+            campaign_ids: Список ID кампаний
+            date_from: Дата начала (YYYY-MM-DD)
+            date_to: Дата окончания (YYYY-MM-DD)
+            fields: Поля для выгрузки
+            processing_mode: Режим формирования (auto, online, offline)
+            max_wait: Сколько секунд ждать готовности отчёта
+            query: Запрос с фильтрами и гранулярностью (вместо campaign_ids и fields)
+
+        Yields:
+            Строки отчёта с типизированными значениями
+
+        Raises:
+            YandexDirectError: Reports вернул ошибку или отчёт не готов
+        """
+        query = self._resolve_query(self._report_query(campaign_ids, fields, query))
+        if query.is_empty:
+            return
+
+        if self._uses_rollup(query):
+            date_from, date_to = self._resolve_period(date_from, date_to)
+            rows = self._rollup(date_from, date_to, processing_mode, max_wait).query_rows(query, date_from, date_to)
+        else:
+            rows = self._iter_rows(query, date_from, date_to, processing_mode, max_wait)
+
+        yield from query.project(rows)
+
+    def _iter_rows(
+        self,
+        query: ReportQuery,
+        date_from: Optional[str],
+        date_to: Optional[str],
+        processing_mode: str,
+        max_wait: float
+    ) -> Iterator[Dict]:
+        """Строки Reports без производных метрик: из хранилища или потоком"""
+        if self._uses_store(query):
+            return self._iter_stored_report(query, date_from, date_to, processing_mode, max_wait)
+        chunks = self._iter_report_chunks(query, date_from, date_to, processing_mode, max_wait)
+        return iter_tsv_chunks(chunks)
+
+    def _rollup(
+        self,
+        date_from: str,
+        date_to: str,
+        processing_mode: str = "auto",
+        max_wait: float = 600,
+        revalidate: bool = False
+    ) -> ReportRollup:
+        """
+        Rollup логина с загруженными днями периода
+
+        Недостающие дни, сегодня и окно пересчёта догружаются одним
+        отчётом на диапазон; одинаковые одновременные догрузки объединяются.
+        Если догрузить не удалось, а дни уже загружались, отдаются старые данные.
+        Режим формирования и ожидание отчёта - как у вызвавшего запроса
+        (например, offline у заданий ReportJobManager).
+
+        Args:
+            revalidate: Уже загруженные, но устаревшие дни обновлять
+                в фоновом потоке, а rollup отдавать сразу (как _cached)
+        """
+        rollup = self.rollups.get(self.login)
+        query = ReportQuery(self.AGGREGATE_FIELDS)
+
+        for start, end in self._rollup_ranges(rollup, date_from, date_to):
+            def fill(start=start, end=end):
+                batch = rollup.batch(start, end)
+                rollup.apply(batch.add_rows(self._iter_rows(query, start, end, processing_mode, max_wait)))
+
+            key = self._cache_key("rollups", [start, end])
+            if revalidate and rollup.covers(start, end):
+                if rollup.begin_refresh(key):
+                    threading.Thread(
+                        target=self._refresh_rollup,
+                        args=(rollup, key, fill),
+                        daemon=True
+                    ).start()
+                continue
+
+            try:
+                self.flight.do(key, fill)
+            except Exception as e:
+                if not rollup.covers(start, end):
+                    raise
+                print(f"Error refreshing rollup: {e}")
+
+        return rollup
+
+    def _refresh_rollup(self, rollup: ReportRollup, key: str, fill: Callable[[], None]):
+        """Фоновое обновление дней rollup'а"""
+        try:
+            self.flight.do(key, fill)
+        except Exception as e:
+            print(f"Error refreshing rollup: {e}")
+        finally:
+            rollup.end_refresh(key)
+
+    def _iter_stored_report(
+        self,
+        query: ReportQuery,
+        date_from: Optional[str],
+        date_to: Optional[str],
+        processing_mode: str,
+        max_wait: float
+    ) -> Iterator[Dict]:
+        """Дозагрузить недостающие дни в хранилище и читать отчёт из него"""
+        date_from, date_to = self._resolve_period(date_from, date_to)
+        key = self._store_key(query)
+
+        for start, end in self.store.missing_ranges(self.login, key, date_from, date_to):
+            chunks = self._iter_report_chunks(query, start, end, processing_mode, max_wait)
+            self.store.save_range(self.login, key, start, end, iter_tsv_chunks(chunks))
+
+        yield from self.store.iter_rows(self.login, key, date_from, date_to)
+
     def get_report(
         self,
         campaign_ids: Optional[List[int]] = None,
         date_from: Optional[str] = None,
         date_to: Optional[str] = None,
-        fields: Optional[List[str]] = None
+        fields: Optional[List[str]] = None,
+        processing_mode: str = "auto",
+        max_wait: float = 600,
+        query: Optional[ReportQuery] = None
     ) -> Dict:
         """
         Получить отчёт по статистике
@@ -165,91 +1211,102 @@ class YandexDirectAPI:
             date_from: Дата начала (YYYY-MM-DD)
             date_to: Дата окончания (YYYY-MM-DD)
             fields: Поля для выгрузки
+            processing_mode: Режим формирования (auto, online, offline)
+            max_wait: Сколько секунд ждать готовности отчёта
+            query: Запрос с фильтрами и гранулярностью (вместо campaign_ids и fields)
 
         Returns:
             Отчёт с данными
         """
-        # Если даты не указаны - последние 30 дней
-        if not date_from:
-            date_from = (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d")
-        if not date_to:
-            date_to = datetime.now().strftime("%Y-%m-%d")
-
-        # Поля по умолчанию
-        if not fields:
-            fields = [
-                "CampaignId", "CampaignName", "Date",
-                "Impressions", "Clicks", "Cost", "Ctr",
-                "AvgCpc", "Conversions", "ConversionRate", "CostPerConversion"
-            ]
+        date_from, date_to = self._resolve_period(date_from, date_to)
+        query = self._report_query(campaign_ids, fields, query)
+
+        def fetch() -> Dict:
+            try:
+                data = list(self.iter_report(
+                    date_from=date_from,
+                    date_to=date_to,
+                    processing_mode=processing_mode,
+                    max_wait=max_wait,
+                    query=query
+                ))
+            except YandexDirectError as e:
+                return e.to_dict()
+            except Exception as e:
+                return {"error": str(e)}
+
+            return self._report_result(data, date_from, date_to)
+
+        params = {"query": query.key(), "date_from": date_from, "date_to": date_to}
+        return self._cached("reports", params, fetch)
 
-        params = {
-            "SelectionCriteria": {
-                "DateFrom": date_from,
-                "DateTo": date_to
-            },
-            "FieldNames": fields,
-            "ReportName": f"Report_{date_from}_{date_to}",
-            "ReportType": "CAMPAIGN_PERFORMANCE_REPORT",
-            "DateRangeType": "CUSTOM_DATE",
-            "Format": "TSV",
-            "IncludeVAT": "YES",
-            "IncludeDiscount": "NO"
-        }
+    # ===== ANALYTICS (Аналитика) =====
 
-        if campaign_ids:
-            params["SelectionCriteria"]["Filter"] = [
-                {
-                    "Field": "CampaignId",
-                    "Operator": "IN",
-                    "Values": campaign_ids
-                }
-            ]
+    def aggregate_report(
+        self,
+        campaign_ids: Optional[List[int]] = None,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None
+    ) -> ReportAggregator:
+        """
+        Агрегировать отчёт за один проход по потоку строк
 
-        # Reports endpoint отличается
-        headers = self.headers.copy()
-        headers["skipReportHeader"] = "true"
-        headers["skipReportSummary"] = "true"
+        Args:
+            campaign_ids: Список ID кампаний
+            date_from: Дата начала (YYYY-MM-DD)
+            date_to: Дата окончания (YYYY-MM-DD)
 
-        try:
-            response = requests.post(
-                self.reports_url,
-                headers=headers,
-                json=params,
-                timeout=120
-            )
+        Если у клиента есть rollup'ы, итоги считаются по накопленным суммам
+        за O(кампаний), а у Direct запрашиваются только новые дни.
+        Устаревшие дни, которые уже загружались, обновляются в фоне,
+        а ответ строится по текущим данным сразу.
+
+        Returns:
+            ReportAggregator с итогами и разбивками по кампаниям и дням
+
+        Raises:
+            YandexDirectError: Reports вернул ошибку или отчёт не готов
+        """
+        date_from, date_to = self._resolve_period(date_from, date_to)
+        if self.rollups is not None:
+            return self._rollup(date_from, date_to, revalidate=True).window(date_from, date_to, campaign_ids)
+
+        def fetch() -> ReportAggregator:
+            query = ReportQuery(self.AGGREGATE_FIELDS, campaign_ids=campaign_ids)
+            return ReportAggregator().add_rows(self.iter_report(date_from=date_from, date_to=date_to, query=query))
+
+        params = {"aggregate": True, "campaign_ids": campaign_ids, "date_from": date_from, "date_to": date_to}
+        return self._cached("reports", params, fetch)
+
+    def get_report_summary(
+        self,
+        campaign_ids: Optional[List[int]] = None,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None
+    ) -> Dict:
+        """
+        Получить итоги отчёта с разбивкой по кампаниям и дням
 
-            if response.status_code == 200:
-                # Парсим TSV ответ
-                lines = response.text.strip().split('\n')
-                if len(lines) < 2:
-                    return {"data": [], "total": 0}
-
-                # Первая строка - заголовки
-                headers_line = lines[0].split('\t')
-
-                # Парсим данные
-                data = []
-                for line in lines[1:]:
-                    values = line.split('\t')
-                    row = dict(zip(headers_line, values))
-                    data.append(row)
-
-                return {
-                    "data": data,
-                    "total": len(data),
-                    "date_from": date_from,
-                    "date_to": date_to
-                }
-            else:
-                return {
-                    "error": f"Status {response.status_code}",
-                    "message": response.text
-                }
+        Args:
+            campaign_ids: Список ID кампаний
+            date_from: Дата начала (YYYY-MM-DD)
+            date_to: Дата окончания (YYYY-MM-DD)
+
+        Returns:
+            Словарь totals / campaigns / daily
+        """
+        default_from, default_to = self.report_period()
+        date_from = date_from or default_from
+        date_to = date_to or default_to
+
+        try:
+            aggregator = self.aggregate_report(campaign_ids, date_from, date_to)
+        except YandexDirectError as e:
+            return e.to_dict()
         except Exception as e:
             return {"error": str(e)}
 
-    # ===== ANALYTICS (Аналитика) =====
+        return {**aggregator.to_dict(), "date_from": date_from, "date_to": date_to}
 
     def get_dashboard_stats(self, campaign_ids: Optional[List[int]] = None) -> Dict:
         """
@@ -259,80 +1316,101 @@ class YandexDirectAPI:
             Словарь с агрегированной статистикой
         """
         # Последние 30 дней
-        date_from = (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d")
-        date_to = datetime.now().strftime("%Y-%m-%d")
+        date_from, date_to = self.report_period()
 
-        report = self.get_report(campaign_ids, date_from, date_to)
-
-        if "error" in report or not report.get("data"):
-            return {
-                "total_impressions": 0,
-                "total_clicks": 0,
-                "total_cost": 0,
-                "avg_ctr": 0,
-                "avg_cpc": 0,
-                "total_conversions": 0,
-                "conversion_rate": 0,
-                "campaigns_count": 0
-            }
+        # Агрегируем потоком, не сохраняя строки отчёта
+        try:
+            aggregator = self.aggregate_report(campaign_ids, date_from, date_to)
+        except Exception as e:
+            print(f"Error getting report: {e}")
+            return self._empty_dashboard_stats()
+
+        return self._dashboard_stats(aggregator, date_from, date_to)
 
-        data = report["data"]
+    def get_dashboard(self, days: int = 30, fields: Optional[List[str]] = None) -> Dict:
+        """
+        Дашборд одним вызовом: кампании, итоги и показатели по кампаниям
 
-        # Агрегируем данные
-        total_impressions = sum(int(row.get("Impressions", 0)) for row in data)
-        total_clicks = sum(int(row.get("Clicks", 0)) for row in data)
-        total_cost = sum(float(row.get("Cost", 0)) for row in data)
-        total_conversions = sum(int(row.get("Conversions", 0)) for row in data)
+        Заменяет пару get_dashboard_stats + get_campaigns: список кампаний
+        и отчёт запрашиваются по одному разу (и берутся из кэша и rollup'ов).
 
-        # Средние показатели
-        avg_ctr = (total_clicks / total_impressions * 100) if total_impressions > 0 else 0
-        avg_cpc = (total_cost / total_clicks) if total_clicks > 0 else 0
-        conversion_rate = (total_conversions / total_clicks * 100) if total_clicks > 0 else 0
+        Args:
+            days: Период - последние days дней
+            fields: Поля кампаний в ответе (Statistics - показатели); None - все
 
-        # Уникальные кампании
-        campaigns = set(row.get("CampaignId") for row in data)
+        Returns:
+            Словарь totals / campaigns / date_from / date_to
+        """
+        date_from, date_to = self.report_period(days)
 
-        return {
-            "total_impressions": total_impressions,
-            "total_clicks": total_clicks,
-            "total_cost": round(total_cost, 2),
-            "avg_ctr": round(avg_ctr, 2),
-            "avg_cpc": round(avg_cpc, 2),
-            "total_conversions": total_conversions,
-            "conversion_rate": round(conversion_rate, 2),
-            "campaigns_count": len(campaigns),
-            "period": f"{date_from} — {date_to}"
-        }
+        try:
+            campaigns = list(self.iter_campaigns())
+            aggregator = self.aggregate_report(None, date_from, date_to)
+        except YandexDirectError as e:
+            return e.to_dict()
+        except Exception as e:
+            return {"error": str(e)}
+
+        return self._dashboard(campaigns, aggregator, date_from, date_to, fields)
 
     # ===== EXPORT (Экспорт) =====
 
-    def export_to_csv(self, campaign_ids: Optional[List[int]] = None, filename: str = "yandex_direct_report.csv") -> str:
+    def iter_export(
+        self,
+        campaign_ids: Optional[List[int]] = None,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+        export_format: str = "csv",
+        chunk_rows: int = 1000
+    ) -> Iterator[bytes]:
+        """
+        Файл экспорта блоками байт по мере загрузки отчёта
+
+        Args:
+            campaign_ids: Список ID кампаний
+            date_from: Дата начала (YYYY-MM-DD)
+            date_to: Дата окончания (YYYY-MM-DD)
+            fields: Поля для выгрузки
+            export_format: csv или parquet (нужен pyarrow)
+            chunk_rows: Сколько строк в одном блоке
+
+        Raises:
+            ValueError: Формат недоступен
+            YandexDirectError: Reports вернул ошибку или отчёт не готов
+        """
+        query = self._report_query(campaign_ids, fields)
+        writer = create_writer(export_format, query.fields)
+        rows = self.iter_report(date_from=date_from, date_to=date_to, query=query)
+        return export_chunks(rows, writer, chunk_rows)
+
+    def export_to_csv(
+        self,
+        campaign_ids: Optional[List[int]] = None,
+        filename: str = "yandex_direct_report.csv",
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None
+    ) -> Optional[str]:
         """
         Экспортировать отчёт в CSV
 
         Args:
             campaign_ids: Список ID кампаний
             filename: Имя файла для сохранения
+            date_from: Дата начала (YYYY-MM-DD)
+            date_to: Дата окончания (YYYY-MM-DD)
 
         Returns:
-            Путь к сохранённому файлу
+            Путь к сохранённому файлу или None при ошибке
         """
-        report = self.get_report(campaign_ids)
-
-        if "error" in report or not report.get("data"):
+        try:
+            with open(filename, 'wb') as f:
+                for chunk in self.iter_export(campaign_ids, date_from, date_to):
+                    f.write(chunk)
+        except Exception as e:
+            print(f"Error exporting report: {e}")
             return None
 
-        import csv
-
-        data = report["data"]
-
-        # Сохраняем в CSV
-        with open(filename, 'w', newline='', encoding='utf-8') as f:
-            if data:
-                writer = csv.DictWriter(f, fieldnames=data[0].keys())
-                writer.writeheader()
-                writer.writerows(data)
-
         return filename
 
 
@@ -0,0 +1,1092 @@
+"""
+Асинхронный клиент Yandex Direct API
+Тот же интерфейс, что и у YandexDirectAPI, но на httpx.AsyncClient:
+запросы не блокируют event loop и могут выполняться параллельно.
+"""
+
+import time
+import uuid
+import asyncio
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Dict, Optional
+import httpx
+
+from yandex_direct_api import BaseYandexDirectAPI, YandexDirectError
+from yandex_direct_cache import TTLCache
+from yandex_direct_export import aexport_chunks, create_writer
+from yandex_direct_flight import AsyncSingleFlight
+from yandex_direct_limits import UnitsLimiter
+from yandex_direct_query import ReportQuery
+from yandex_direct_retry import CircuitBreaker, RetryPolicy
+from yandex_direct_report import ReportAggregator, TsvBytesParser
+from yandex_direct_rollup import ReportRollup, RollupStore
+from yandex_direct_snapshot import AccountSnapshot
+from yandex_direct_store import ReportStore
+
+
+def create_async_client(max_connections: int = 20, max_keepalive_connections: int = 10) -> httpx.AsyncClient:
+    """
+    Создать асинхронный HTTP-клиент с пулом keep-alive соединений
+
+    Args:
+        max_connections: Максимум одновременных соединений
+        max_keepalive_connections: Сколько соединений держать открытыми
+
+    Returns:
+        httpx.AsyncClient, который можно разделять между клиентами
+    """
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive_connections
+    )
+    return httpx.AsyncClient(limits=limits, headers={"Accept-Encoding": "gzip, deflate"})
+
+
+class AsyncYandexDirectAPI(BaseYandexDirectAPI):
+    """
+    Асинхронный клиент Yandex Direct API v5
+    """
+
+    def __init__(
+        self,
+        access_token: str,
+        login: str,
+        is_sandbox: bool = False,
+        http_client: Optional[httpx.AsyncClient] = None,
+        max_connections: int = 20,
+        cache: Optional[TTLCache] = None,
+        store: Optional[ReportStore] = None,
+        limiter: Optional[UnitsLimiter] = None,
+        retry: Optional[RetryPolicy] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        flight: Optional[AsyncSingleFlight] = None,
+        rollups: Optional[RollupStore] = None
+    ):
+        """
+        Инициализация асинхронного клиента
+
+        Args:
+            access_token: OAuth токен доступа
+            login: Логин клиента в Яндекс.Директ
+            is_sandbox: Использовать sandbox режим (для тестирования)
+            http_client: Готовый httpx.AsyncClient (если None - создаётся свой)
+            max_connections: Максимум одновременных соединений для своего клиента
+            cache: Кэш ответов (если None - запросы не кэшируются)
+            store: Хранилище отчётов по дням (если None - каждый отчёт
+                выгружается целиком)
+            limiter: Лимитер запросов с учётом баллов (если None - без ограничений)
+            retry: Политика повторов get-запросов (если None - по умолчанию)
+            breaker: Circuit breaker (если None - общий для хоста API)
+            flight: Группа объединения одинаковых одновременных запросов
+                (если None - своя у клиента)
+            rollups: Предрасчитанные итоги по кампаниям и дням (если None -
+                итоги каждый раз считаются по строкам отчёта)
+        """
+        super().__init__(access_token, login, is_sandbox, cache, store, limiter, retry, breaker, rollups)
+        self.flight = flight or AsyncSingleFlight()
+
+        self._owns_client = http_client is None
+        self.http_client = http_client or create_async_client(max_connections)
+        self._background_tasks = set()
+
+    async def aclose(self):
+        """Закрыть собственный HTTP-клиент (чужой клиент не трогаем)"""
+        if self._owns_client:
+            await self.http_client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.aclose()
+
+    def _spawn(self, coro: Awaitable) -> asyncio.Task:
+        """Запустить фоновую задачу и держать ссылку до её завершения"""
+        task = asyncio.create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+        return task
+
+    async def _cached(self, resource: str, params: Any, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Взять значение из кэша или получить его через await fetch()
+
+        Устаревшая запись отдаётся сразу, а обновление запускается
+        фоновой задачей (не больше одной на ключ). Если баллов мало
+        или запрос завершился ошибкой, отдаётся любое сохранённое значение.
+        Одинаковые одновременные запросы выполняются один раз.
+        """
+        key = self._cache_key(resource, params)
+        if self.cache is None:
+            return await self.flight.do(key, fetch)
+
+        entry = self.cache.lookup(key)
+        budget_low = self._is_budget_low()
+
+        if entry is not None:
+            if not entry.is_fresh and not budget_low and self.cache.begin_refresh(key):
+                self._spawn(self._refresh_cached(resource, key, fetch))
+            return entry.value
+
+        fallback = self.cache.peek(key)
+        if budget_low and fallback is not None:
+            return fallback
+
+        value = await self.flight.do(key, fetch)
+        if self._is_cacheable(value):
+            self.cache.set(resource, key, value)
+        elif fallback is not None:
+            return fallback
+        return value
+
+    async def _refresh_cached(self, resource: str, key: str, fetch: Callable[[], Awaitable[Any]]):
+        """Фоновое обновление записи кэша"""
+        try:
+            value = await self.flight.do(key, fetch)
+        except Exception as e:
+            print(f"Error refreshing {resource}: {e}")
+            value = {"error": str(e)}
+
+        if self._is_cacheable(value):
+            self.cache.set(resource, key, value)
+        else:
+            self.cache.end_refresh(key)
+
+    async def _make_request(self, service: str, method: str, params: Dict) -> Dict:
+        """
+        Выполнить запрос к API
+
+        Ответы на get-запросы кэшируются, если у клиента задан кэш.
+
+        Args:
+            service: Название сервиса (campaigns, adgroups, ads, etc.)
+            method: Метод API (get, add, update, delete)
+            params: Параметры запроса
+
+        Returns:
+            Ответ от API
+        """
+        if method == "get":
+            return await self._cached(service, params, lambda: self._send_request(service, method, params))
+        return await self._send_request(service, method, params)
+
+    async def _send_request(self, service: str, method: str, params: Dict) -> Dict:
+        """
+        Отправить запрос к API без кэша
+
+        get-запросы повторяются при сетевых ошибках, 5xx и временных
+        ошибках Direct; пока circuit breaker открыт, запрос не отправляется.
+        """
+        url = f"{self.api_url}{service}"
+
+        payload = {
+            "method": method,
+            "params": params
+        }
+
+        attempts = self._attempts(method)
+        for attempt in range(attempts):
+            if not self.breaker.allow():
+                return self._circuit_open_error()
+
+            await asyncio.sleep(self._rate_delay())
+            data, status = await self._post_once(url, payload)
+            self._record_attempt(status)
+
+            if "error" not in data or attempt == attempts - 1 or not self.retry.should_retry(status, data):
+                return data
+            await asyncio.sleep(self.retry.delay(attempt))
+
+    async def _post_once(self, url: str, payload: Dict):
+        """
+        Одна попытка запроса
+
+        Returns:
+            (ответ, HTTP-статус или None при сетевой ошибке)
+        """
+        try:
+            response = await self.http_client.post(
+                url,
+                headers=self.headers,
+                json=payload,
+                timeout=httpx.Timeout(self.REQUEST_TIMEOUT, connect=self.CONNECT_TIMEOUT)
+            )
+        except httpx.HTTPError as e:
+            return {"error": str(e), "status": "failed"}, None
+
+        try:
+            data = response.json()
+        except ValueError:
+            data = None
+
+        if response.status_code >= 400:
+            data = self._error_response(response.status_code, response.reason_phrase, data)
+        elif not isinstance(data, dict):
+            data = {"error": "Invalid JSON response", "status": "failed"}
+
+        self._track_units(response.headers, data)
+        return data, response.status_code
+
+    async def _iter_pages(
+        self,
+        service: str,
+        params: Dict,
+        result_key: str,
+        page_size: Optional[int] = None,
+        concurrency: int = 1
+    ) -> AsyncIterator[Dict]:
+        """
+        Лениво обойти все страницы get-метода
+
+        Первая страница запрашивается одна. Если API вернул LimitedBy
+        и concurrency > 1, следующие страницы запрашиваются окнами
+        по concurrency штук параллельно, пока не придёт страница без LimitedBy.
+
+        Raises:
+            YandexDirectError: API вернул ошибку
+        """
+        page_size = page_size or self.PAGE_LIMIT
+
+        async def fetch(offset: int):
+            response = await self._make_request(service, "get", self._page_params(params, offset, page_size))
+            return self._page_result(response, result_key)
+
+        items, limited_by = await fetch(0)
+        for item in items:
+            yield item
+
+        while limited_by is not None:
+            offsets = [limited_by + i * page_size for i in range(max(1, concurrency))]
+            pages = await asyncio.gather(*(fetch(offset) for offset in offsets))
+
+            for items, limited_by in pages:
+                for item in items:
+                    yield item
+                if limited_by is None:
+                    return
+
+    # ===== CAMPAIGNS (Кампании) =====
+
+    def iter_campaigns(
+        self,
+        campaign_ids: Optional[List[int]] = None,
+        page_size: Optional[int] = None,
+        concurrency: int = 1,
+        states: Optional[List[str]] = None
+    ) -> AsyncIterator[Dict]:
+        """
+        Лениво перебрать кампании по страницам
+
+        Args:
+            campaign_ids: Список ID кампаний (если None - все кампании)
+            page_size: Размер страницы (по умолчанию максимальный)
+            concurrency: Сколько страниц запрашивать параллельно после первой
+            states: Только кампании в этих состояниях (ON, SUSPENDED, ...)
+
+        Raises:
+            YandexDirectError: API вернул ошибку
+        """
+        params = self._campaigns_params(campaign_ids, states)
+        return self._iter_pages("campaigns", params, "Campaigns", page_size, concurrency)
+
+    async def get_campaigns(self, campaign_ids: Optional[List[int]] = None, concurrency: int = 1) -> List[Dict]:
+        """
+        Получить список кампаний (все страницы)
+
+        Args:
+            campaign_ids: Список ID кампаний (если None - все кампании)
+            concurrency: Сколько страниц запрашивать параллельно после первой
+
+        Returns:
+            Список кампаний с параметрами
+        """
+        try:
+            return [campaign async for campaign in self.iter_campaigns(campaign_ids, concurrency=concurrency)]
+        except YandexDirectError as e:
+            print(f"Error getting campaigns: {e}")
+            return []
+
+    async def get_campaign_stats(self, campaign_id: int, date_from: str, date_to: str) -> Dict:
+        """
+        Получить статистику по кампании
+
+        Args:
+            campaign_id: ID кампании
+            date_from: Дата начала (YYYY-MM-DD)
+            date_to: Дата окончания (YYYY-MM-DD)
+
+        Returns:
+            Статистика кампании
+        """
+        return await self.get_report(
+            campaign_ids=[campaign_id],
+            date_from=date_from,
+            date_to=date_to
+        )
+
+    # ===== AD GROUPS (Группы объявлений) =====
+
+    def iter_adgroups(
+        self,
+        campaign_ids: Optional[List[int]] = None,
+        page_size: Optional[int] = None,
+        concurrency: int = 1
+    ) -> AsyncIterator[Dict]:
+        """
+        Лениво перебрать группы объявлений по страницам
+
+        Args:
+            campaign_ids: Список ID кампаний
+            page_size: Размер страницы (по умолчанию максимальный)
+            concurrency: Сколько страниц запрашивать параллельно после первой
+
+        Raises:
+            YandexDirectError: API вернул ошибку
+        """
+        return self._iter_pages("adgroups", self._adgroups_params(campaign_ids), "AdGroups", page_size, concurrency)
+
+    async def get_adgroups(self, campaign_ids: Optional[List[int]] = None, concurrency: int = 1) -> List[Dict]:
+        """
+        Получить группы объявлений (все страницы)
+
+        Args:
+            campaign_ids: Список ID кампаний
+            concurrency: Сколько страниц запрашивать параллельно после первой
+
+        Returns:
+            Список групп объявлений
+        """
+        try:
+            return [adgroup async for adgroup in self.iter_adgroups(campaign_ids, concurrency=concurrency)]
+        except YandexDirectError as e:
+            print(f"Error getting ad groups: {e}")
+            return []
+
+    # ===== AGENCY (Агентский аккаунт) =====
+
+    def for_client(self, login: str) -> "AsyncYandexDirectAPI":
+        """
+        Клиент для логина клиента агентства
+
+        Использует тот же HTTP-клиент, кэш, хранилище, rollup'ы и лимитер,
+        а в заголовке Client-Login передаёт логин клиента.
+        """
+        return AsyncYandexDirectAPI(
+            self.access_token,
+            login,
+            self.is_sandbox,
+            http_client=self.http_client,
+            cache=self.cache,
+            store=self.store,
+            limiter=self.limiter,
+            retry=self.retry,
+            breaker=self.breaker,
+            flight=self.flight,
+            rollups=self.rollups
+        )
+
+    def iter_agency_clients(self) -> AsyncIterator[Dict]:
+        """
+        Лениво перебрать клиентов агентства
+
+        Raises:
+            YandexDirectError: API вернул ошибку (например, аккаунт не агентский)
+        """
+        return self._iter_pages("agencyclients", self._agency_clients_params(), "Clients")
+
+    async def get_agency_clients(self) -> List[Dict]:
+        """
+        Получить клиентов агентства
+
+        Returns:
+            Список клиентов (Login, ClientId, ClientInfo)
+        """
+        try:
+            return [client async for client in self.iter_agency_clients()]
+        except YandexDirectError as e:
+            print(f"Error getting agency clients: {e}")
+            return []
+
+    async def get_agency_dashboard(
+        self,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        concurrency: int = 5
+    ) -> Dict:
+        """
+        Сводная статистика по всем клиентам агентства
+
+        Кампании и отчёты клиентов запрашиваются параллельно,
+        не больше concurrency клиентов одновременно.
+
+        Args:
+            date_from: Дата начала (YYYY-MM-DD)
+            date_to: Дата окончания (YYYY-MM-DD)
+            concurrency: Сколько клиентов обрабатывать параллельно
+
+        Returns:
+            Словарь totals / clients / campaigns / daily
+        """
+        date_from, date_to = self._resolve_period(date_from, date_to)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def load(client: Dict):
+            api = self.for_client(client["Login"])
+            async with semaphore:
+                try:
+                    campaigns = [campaign async for campaign in api.iter_campaigns()]
+                    return client, campaigns, await api.aggregate_report(None, date_from, date_to), None
+                except Exception as e:
+                    print(f"Error getting stats for {client['Login']}: {e}")
+                    return client, [], None, str(e)
+
+        results = await asyncio.gather(*(load(client) for client in await self.get_agency_clients()))
+        return self._agency_dashboard(results, date_from, date_to)
+
+    # ===== ACCOUNT SNAPSHOT (Снимок аккаунта) =====
+
+    async def get_account_snapshot(self, campaign_ids: Optional[List[int]] = None, concurrency: int = 4) -> AccountSnapshot:
+        """
+        Загрузить кампании, группы, объявления, ключевые фразы и ставки
+
+        Сначала запрашиваются кампании, затем остальные сервисы
+        по пачкам кампаний, не больше concurrency запросов одновременно.
+
+        Args:
+            campaign_ids: Список ID кампаний (если None - все кампании)
+            concurrency: Сколько запросов выполнять параллельно
+
+        Returns:
+            AccountSnapshot; ошибки отдельных запросов - в snapshot.errors
+        """
+        snapshot = AccountSnapshot(self.login)
+
+        try:
+            snapshot.add("campaigns", [campaign async for campaign in self.iter_campaigns(campaign_ids)])
+        except YandexDirectError as e:
+            print(f"Error getting campaigns: {e}")
+            snapshot.add_error("campaigns", str(e))
+            return snapshot
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch(service: str, params: Dict, result_key: str):
+            async with semaphore:
+                try:
+                    return service, [item async for item in self._iter_pages(service, params, result_key)], None
+                except YandexDirectError as e:
+                    return service, [], str(e)
+
+        results = await asyncio.gather(*(
+            fetch(*request) for request in self._snapshot_requests(list(snapshot.campaigns))
+        ))
+        for service, items, error in results:
+            if error is not None:
+                print(f"Error getting {service}: {error}")
+                snapshot.add_error(service, error)
+            snapshot.add(service, items)
+
+        return snapshot
+
+    # ===== REPORTS (Отчёты) =====
+
+    async def _resolve_query(self, query: ReportQuery) -> ReportQuery:
+        """
+        Заменить фильтр по состояниям кампаний списком ID
+
+        Reports не фильтрует по состоянию кампании, поэтому
+        подходящие кампании сначала выбираются через campaigns.get.
+        """
+        if not query.campaign_states:
+            return query
+        campaigns = self.iter_campaigns(query.campaign_ids, states=query.campaign_states)
+        return query.restrict([campaign["Id"] async for campaign in campaigns])
+
+    async def _iter_report_chunks(
+        self,
+        query: ReportQuery,
+        date_from: Optional[str],
+        date_to: Optional[str],
+        processing_mode: str,
+        max_wait: float
+    ) -> AsyncIterator[bytes]:
+        """
+        Байтовые блоки TSV ответа Reports по мере загрузки (уже распакованные)
+
+        Пока отчёт в очереди (201/202), ожидание идёт через asyncio.sleep
+        и не занимает event loop.
+
+        Raises:
+            YandexDirectError: Reports вернул ошибку или отчёт не готов
+        """
+        default_from, default_to = self.report_period()
+        date_from = date_from or default_from
+        date_to = date_to or default_to
+
+        params = self._report_params(query, date_from, date_to)
+        headers = self._report_headers(processing_mode)
+        deadline = time.monotonic() + max_wait
+        attempt = 0
+
+        failures = 0
+
+        while True:
+            if not self.breaker.allow():
+                raise YandexDirectError(self._circuit_open_error()["error"], status="unavailable")
+
+            await asyncio.sleep(self._rate_delay())
+            streaming = False
+            try:
+                async with self.http_client.stream(
+                    "POST",
+                    self.reports_url,
+                    headers=headers,
+                    json=params,
+                    timeout=httpx.Timeout(120, connect=self.CONNECT_TIMEOUT)
+                ) as response:
+                    self._record_attempt(response.status_code)
+
+                    if response.status_code == 200:
+                        streaming = True
+                        async for chunk in response.aiter_bytes(self.REPORT_CHUNK_SIZE):
+                            yield chunk
+                        return
+
+                    await response.aread()
+            except httpx.HTTPError as e:
+                # Обрыв уже отданного потока не повторяем: часть строк прочитана
+                if streaming:
+                    raise YandexDirectError(str(e), status="failed")
+                # Сетевая ошибка или таймаут - сбой хоста, повторяем как в _send_request
+                self._record_attempt(None)
+                if failures + 1 >= self.retry.max_attempts:
+                    raise YandexDirectError(str(e), status="failed")
+                await asyncio.sleep(self.retry.delay(failures))
+                failures += 1
+                continue
+
+            if response.status_code in self.REPORT_PENDING_STATUSES:
+                delay = self._report_retry_delay(response.headers, attempt)
+            elif response.status_code in self.retry.retry_statuses and failures + 1 < self.retry.max_attempts:
+                delay = self.retry.delay(failures)
+                failures += 1
+            else:
+                raise YandexDirectError(f"Status {response.status_code}", response.text)
+
+            if time.monotonic() + delay > deadline:
+                raise YandexDirectError("Report is not ready", status="pending")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def iter_report(
+        self,
+        campaign_ids: Optional[List[int]] = None,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+        processing_mode: str = "auto",
+        max_wait: float = 600,
+        query: Optional[ReportQuery] = None
+    ) -> AsyncIterator[Dict]:
+        """
+        Потоково читать отчёт по статистике
+
+        Args:
+            campaign_ids: Список ID кампаний
+            date_from: Дата начала (YYYY-MM-DD)
+            date_to: Дата окончания (YYYY-MM-DD)
+            fields: Поля для выгрузки
+            processing_mode: Режим формирования (auto, online, offline)
+            max_wait: Сколько секунд ждать готовности отчёта
+            query: Запрос с фильтрами и гранулярностью (вместо campaign_ids и fields)
+
+        Yields:
+            Строки отчёта с типизированными значениями
+
+        Raises:
+            YandexDirectError: Reports вернул ошибку или отчёт не готов
+        """
+        query = await self._resolve_query(self._report_query(campaign_ids, fields, query))
+        if query.is_empty:
+            return
+
+        if self._uses_rollup(query):
+            date_from, date_to = self._resolve_period(date_from, date_to)
+            rollup = await self._rollup(date_from, date_to, processing_mode, max_wait)
+            for row in query.project(rollup.query_rows(query, date_from, date_to)):
+                yield row
+            return
+
+        async for row in self._iter_rows(query, date_from, date_to, processing_mode, max_wait):
+            yield query.project_row(row)
+
+    async def _iter_rows(
+        self,
+        query: ReportQuery,
+        date_from: Optional[str],
+        date_to: Optional[str],
+        processing_mode: str,
+        max_wait: float
+    ) -> AsyncIterator[Dict]:
+        """Строки Reports без производных метрик: из хранилища или потоком"""
+        if self._uses_store(query):
+            async for row in self._iter_stored_report(query, date_from, date_to, processing_mode, max_wait):
+                yield row
+            return
+
+        parser = TsvBytesParser()
+        async for chunk in self._iter_report_chunks(query, date_from, date_to, processing_mode, max_wait):
+            for row in parser.to_dicts(parser.feed(chunk)):
+                yield row
+        for row in parser.to_dicts(parser.close()):
+            yield row
+
+    async def _rollup(
+        self,
+        date_from: str,
+        date_to: str,
+        processing_mode: str = "auto",
+        max_wait: float = 600,
+        revalidate: bool = False
+    ) -> ReportRollup:
+        """
+        Rollup логина с загруженными днями периода
+
+        Недостающие дни, сегодня и окно пересчёта догружаются одним
+        отчётом на диапазон; одинаковые одновременные догрузки объединяются.
+        Если догрузить не удалось, а дни уже загружались, отдаются старые данные.
+        Режим формирования и ожидание отчёта - как у вызвавшего запроса
+        (например, offline у заданий ReportJobManager).
+
+        Args:
+            revalidate: Уже загруженные, но устаревшие дни обновлять
+                фоновой задачей, а rollup отдавать сразу (как _cached)
+        """
+        rollup = self.rollups.get(self.login)
+        query = ReportQuery(self.AGGREGATE_FIELDS)
+
+        for start, end in self._rollup_ranges(rollup, date_from, date_to):
+            async def fill(start=start, end=end):
+                batch = rollup.batch(start, end)
+                async for row in self._iter_rows(query, start, end, processing_mode, max_wait):
+                    batch.add(row)
+                rollup.apply(batch)
+
+            key = self._cache_key("rollups", [start, end])
+            if revalidate and rollup.covers(start, end):
+                if rollup.begin_refresh(key):
+                    self._spawn(self._refresh_rollup(rollup, key, fill))
+                continue
+
+            try:
+                await self.flight.do(key, fill)
+            except Exception as e:
+                if not rollup.covers(start, end):
+                    raise
+                print(f"Error refreshing rollup: {e}")
+
+        return rollup
+
+    async def _refresh_rollup(self, rollup: ReportRollup, key: str, fill: Callable[[], Awaitable[None]]):
+        """Фоновое обновление дней rollup'а"""
+        try:
+            await self.flight.do(key, fill)
+        except Exception as e:
+            print(f"Error refreshing rollup: {e}")
+        finally:
+            rollup.end_refresh(key)
+
+    async def _iter_stored_report(
+        self,
+        query: ReportQuery,
+        date_from: Optional[str],
+        date_to: Optional[str],
+        processing_mode: str,
+        max_wait: float
+    ) -> AsyncIterator[Dict]:
+        """
+        Дозагрузить недостающие дни в хранилище и читать отчёт из него
+
+        Обращения к SQLite выполняются в пуле потоков, чтобы не блокировать event loop.
+        """
+        date_from, date_to = self._resolve_period(date_from, date_to)
+        key = self._store_key(query)
+
+        missing = await asyncio.to_thread(self.store.missing_ranges, self.login, key, date_from, date_to)
+        for start, end in missing:
+            # Строки пишутся пачками по мере загрузки: память не растёт с диапазоном
+            stage_id = self.store.begin_stage()
+            try:
+                parser = TsvBytesParser()
+                rows = []
+                async for chunk in self._iter_report_chunks(query, start, end, processing_mode, max_wait):
+                    rows.extend(parser.to_dicts(parser.feed(chunk)))
+                    if len(rows) >= self.store.BATCH_SIZE:
+                        await asyncio.to_thread(self.store.stage_rows, stage_id, rows)
+                        rows = []
+                rows.extend(parser.to_dicts(parser.close()))
+                if rows:
+                    await asyncio.to_thread(self.store.stage_rows, stage_id, rows)
+                await asyncio.to_thread(self.store.commit_stage, stage_id, self.login, key, start, end)
+            except BaseException:
+                await asyncio.shield(asyncio.to_thread(self.store.discard_stage, stage_id))
+                raise
+
+        position = ("", 0)
+        while position is not None:
+            rows, position = await asyncio.to_thread(
+                self.store.read_page, self.login, key, date_from, date_to, position
+            )
+            for row in rows:
+                yield row
+
+    async def get_report(
+        self,
+        campaign_ids: Optional[List[int]] = None,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+        processing_mode: str = "auto",
+        max_wait: float = 600,
+        query: Optional[ReportQuery] = None
+    ) -> Dict:
+        """
+        Получить отчёт по статистике
+
+        Args:
+            campaign_ids: Список ID кампаний
+            date_from: Дата начала (YYYY-MM-DD)
+            date_to: Дата окончания (YYYY-MM-DD)
+            fields: Поля для выгрузки
+            processing_mode: Режим формирования (auto, online, offline)
+            max_wait: Сколько секунд ждать готовности отчёта
+            query: Запрос с фильтрами и гранулярностью (вместо campaign_ids и fields)
+
+        Returns:
+            Отчёт с данными
+        """
+        date_from, date_to = self._resolve_period(date_from, date_to)
+        query = self._report_query(campaign_ids, fields, query)
+
+        async def fetch() -> Dict:
+            try:
+                data = [
+                    row async for row in self.iter_report(
+                        date_from=date_from,
+                        date_to=date_to,
+                        processing_mode=processing_mode,
+                        max_wait=max_wait,
+                        query=query
+                    )
+                ]
+            except YandexDirectError as e:
+                return e.to_dict()
+            except Exception as e:
+                return {"error": str(e)}
+
+            return self._report_result(data, date_from, date_to)
+
+        params = {"query": query.key(), "date_from": date_from, "date_to": date_to}
+        return await self._cached("reports", params, fetch)
+
+    # ===== ANALYTICS (Аналитика) =====
+
+    async def aggregate_report(
+        self,
+        campaign_ids: Optional[List[int]] = None,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None
+    ) -> ReportAggregator:
+        """
+        Агрегировать отчёт за один проход по потоку строк
+
+        Args:
+            campaign_ids: Список ID кампаний
+            date_from: Дата начала (YYYY-MM-DD)
+            date_to: Дата окончания (YYYY-MM-DD)
+
+        Если у клиента есть rollup'ы, итоги считаются по накопленным суммам
+        за O(кампаний), а у Direct запрашиваются только новые дни.
+        Устаревшие дни, которые уже загружались, обновляются в фоне,
+        а ответ строится по текущим данным сразу.
+
+        Returns:
+            ReportAggregator с итогами и разбивками по кампаниям и дням
+
+        Raises:
+            YandexDirectError: Reports вернул ошибку или отчёт не готов
+        """
+        date_from, date_to = self._resolve_period(date_from, date_to)
+        if self.rollups is not None:
+            return (await self._rollup(date_from, date_to, revalidate=True)).window(date_from, date_to, campaign_ids)
+
+        async def fetch() -> ReportAggregator:
+            aggregator = ReportAggregator()
+            query = ReportQuery(self.AGGREGATE_FIELDS, campaign_ids=campaign_ids)
+            async for row in self.iter_report(date_from=date_from, date_to=date_to, query=query):
+                aggregator.add(row)
+            return aggregator
+
+        params = {"aggregate": True, "campaign_ids": campaign_ids, "date_from": date_from, "date_to": date_to}
+        return await self._cached("reports", params, fetch)
+
+    async def get_report_summary(
+        self,
+        campaign_ids: Optional[List[int]] = None,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None
+    ) -> Dict:
+        """
+        Получить итоги отчёта с разбивкой по кампаниям и дням
+
+        Args:
+            campaign_ids: Список ID кампаний
+            date_from: Дата начала (YYYY-MM-DD)
+            date_to: Дата окончания (YYYY-MM-DD)
+
+        Returns:
+            Словарь totals / campaigns / daily
+        """
+        default_from, default_to = self.report_period()
+        date_from = date_from or default_from
+        date_to = date_to or default_to
+
+        try:
+            aggregator = await self.aggregate_report(campaign_ids, date_from, date_to)
+        except YandexDirectError as e:
+            return e.to_dict()
+        except Exception as e:
+            return {"error": str(e)}
+
+        return {**aggregator.to_dict(), "date_from": date_from, "date_to": date_to}
+
+    async def get_dashboard_stats(self, campaign_ids: Optional[List[int]] = None) -> Dict:
+        """
+        Получить общую статистику для дашборда
+
+        Returns:
+            Словарь с агрегированной статистикой
+        """
+        date_from, date_to = self.report_period()
+
+        try:
+            aggregator = await self.aggregate_report(campaign_ids, date_from, date_to)
+        except Exception as e:
+            print(f"Error getting report: {e}")
+            return self._empty_dashboard_stats()
+
+        return self._dashboard_stats(aggregator, date_from, date_to)
+
+    async def get_dashboard(self, days: int = 30, fields: Optional[List[str]] = None) -> Dict:
+        """
+        Дашборд одним вызовом: кампании, итоги и показатели по кампаниям
+
+        Список кампаний и отчёт запрашиваются параллельно и по одному разу.
+
+        Args:
+            days: Период - последние days дней
+            fields: Поля кампаний в ответе (Statistics - показатели); None - все
+
+        Returns:
+            Словарь totals / campaigns / date_from / date_to
+        """
+        date_from, date_to = self.report_period(days)
+
+        async def collect_campaigns() -> List[Dict]:
+            return [campaign async for campaign in self.iter_campaigns()]
+
+        try:
+            campaigns, aggregator = await asyncio.gather(
+                collect_campaigns(),
+                self.aggregate_report(None, date_from, date_to)
+            )
+        except YandexDirectError as e:
+            return e.to_dict()
+        except Exception as e:
+            return {"error": str(e)}
+
+        return self._dashboard(campaigns, aggregator, date_from, date_to, fields)
+
+    # ===== EXPORT (Экспорт) =====
+
+    def iter_export(
+        self,
+        campaign_ids: Optional[List[int]] = None,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+        export_format: str = "csv",
+        chunk_rows: int = 1000
+    ) -> AsyncIterator[bytes]:
+        """
+        Файл экспорта блоками байт по мере загрузки отчёта
+
+        Подходит для StreamingResponse: ни временного файла,
+        ни всего отчёта в памяти.
+
+        Args:
+            campaign_ids: Список ID кампаний
+            date_from: Дата начала (YYYY-MM-DD)
+            date_to: Дата окончания (YYYY-MM-DD)
+            fields: Поля для выгрузки
+            export_format: csv или parquet (нужен pyarrow)
+            chunk_rows: Сколько строк в одном блоке
+
+        Raises:
+            ValueError: Формат недоступен
+            YandexDirectError: Reports вернул ошибку или отчёт не готов
+        """
+        query = self._report_query(campaign_ids, fields)
+        writer = create_writer(export_format, query.fields)
+        rows = self.iter_report(date_from=date_from, date_to=date_to, query=query)
+        return aexport_chunks(rows, writer, chunk_rows)
+
+    async def export_to_csv(
+        self,
+        campaign_ids: Optional[List[int]] = None,
+        filename: str = "yandex_direct_report.csv",
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None
+    ) -> Optional[str]:
+        """
+        Экспортировать отчёт в CSV
+
+        Args:
+            campaign_ids: Список ID кампаний
+            filename: Имя файла для сохранения
+            date_from: Дата начала (YYYY-MM-DD)
+            date_to: Дата окончания (YYYY-MM-DD)
+
+        Returns:
+            Путь к сохранённому файлу или None при ошибке
+        """
+        try:
+            with open(filename, 'wb') as f:
+                async for chunk in self.iter_export(campaign_ids, date_from, date_to):
+                    f.write(chunk)
+        except Exception as e:
+            print(f"Error exporting report: {e}")
+            return None
+
+        return filename
+
+
+# ===== REPORT JOBS (Очередь офлайн-отчётов) =====
+
+class ReportJob:
+    """
+    Задача на формирование отчёта в офлайн-режиме
+    """
+
+    def __init__(self, job_id: str, params: Dict, client: Optional["AsyncYandexDirectAPI"] = None):
+        self.id = job_id
+        self.params = params
+        self.client = client
+        self.status = "queued"
+        self.result: Optional[Dict] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def to_dict(self) -> Dict:
+        """Состояние задачи без данных отчёта"""
+        return {
+            "job_id": self.id,
+            "login": self.client.login if self.client is not None else None,
+            "status": self.status,
+            "params": self.params,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at
+        }
+
+
+class ReportJobManager:
+    """
+    Менеджер офлайн-отчётов
+
+    Ставит отчёты в очередь Reports (processingMode=offline), опрашивает их
+    с учётом retryIn и отдаёт результат по готовности. Одновременно
+    формируется не больше max_parallel отчётов, остальные ждут в очереди.
+    """
+
+    def __init__(
+        self,
+        client: AsyncYandexDirectAPI,
+        max_parallel: int = 5,
+        max_wait: float = 1800,
+        max_jobs: int = 100
+    ):
+        """
+        Args:
+            client: Асинхронный клиент Direct
+            max_parallel: Сколько отчётов формировать одновременно
+            max_wait: Сколько секунд ждать готовности одного отчёта
+            max_jobs: Сколько завершённых задач хранить для просмотра статуса
+        """
+        self.client = client
+        self.max_wait = max_wait
+        self.max_jobs = max_jobs
+        self._semaphore = asyncio.Semaphore(max_parallel)
+        self._jobs: "OrderedDict[str, ReportJob]" = OrderedDict()
+
+    def submit(
+        self,
+        campaign_ids: Optional[List[int]] = None,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+        client: Optional[AsyncYandexDirectAPI] = None
+    ) -> ReportJob:
+        """
+        Поставить отчёт в очередь (не дожидаясь результата)
+
+        Args:
+            client: Клиент другого логина (по умолчанию - клиент менеджера)
+
+        Returns:
+            Задача; результат доступен через wait() или get()
+        """
+        params = {
+            "campaign_ids": campaign_ids,
+            "date_from": date_from,
+            "date_to": date_to,
+            "fields": fields
+        }
+        job = ReportJob(uuid.uuid4().hex, params, client or self.client)
+        job.task = asyncio.create_task(self._run(job))
+
+        self._jobs[job.id] = job
+        self._prune()
+        return job
+
+    async def run(self, **params) -> Dict:
+        """Поставить отчёт в очередь и дождаться результата"""
+        return await self.wait(self.submit(**params))
+
+    async def wait(self, job: ReportJob) -> Dict:
+        """Дождаться завершения задачи"""
+        await asyncio.shield(job.task)
+        return job.result
+
+    def get(self, job_id: str) -> Optional[ReportJob]:
+        """Найти задачу по ID"""
+        return self._jobs.get(job_id)
+
+    async def _run(self, job: ReportJob):
+        async with self._semaphore:
+            job.status = "running"
+            result = await job.client.get_report(
+                processing_mode="offline",
+                max_wait=self.max_wait,
+                **job.params
+            )
+
+        job.result = result
+        job.status = "failed" if "error" in result else "done"
+        job.finished_at = time.time()
+
+    def _prune(self):
+        """Удалить самые старые завершённые задачи сверх max_jobs"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished_at]
+        for job_id in finished[:max(0, len(self._jobs) - self.max_jobs)]:
+            del self._jobs[job_id]
@@ -0,0 +1,159 @@
+"""
+Кэш ответов Yandex Direct API
+TTL для каждого типа ресурса, вытеснение по LRU и stale-while-revalidate:
+устаревшее значение отдаётся сразу, а обновление идёт одно, в фоне.
+"""
+
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+class CacheEntry:
+    """
+    Запись кэша
+    """
+
+    __slots__ = ("value", "stored_at", "fresh_until", "stale_until", "refreshing")
+
+    def __init__(self, value: Any, ttl: float, stale_ttl: float):
+        now = time.monotonic()
+        self.value = value
+        self.stored_at = now
+        self.fresh_until = now + ttl
+        self.stale_until = now + ttl + stale_ttl
+        self.refreshing = False
+
+    @property
+    def is_fresh(self) -> bool:
+        return time.monotonic() < self.fresh_until
+
+    @property
+    def is_expired(self) -> bool:
+        return time.monotonic() >= self.stale_until
+
+
+class TTLCache:
+    """
+    Потокобезопасный TTL/LRU кэш с поддержкой stale-while-revalidate
+
+    Один экземпляр можно разделять между клиентами разных логинов:
+    логин входит в ключ.
+    """
+
+    # Время жизни по типам ресурсов, секунды
+    DEFAULT_TTLS = {
+        "campaigns": 300,
+        "adgroups": 300,
+        "reports": 900
+    }
+
+    def __init__(
+        self,
+        max_entries: int = 512,
+        ttls: Optional[Dict[str, float]] = None,
+        default_ttl: float = 300,
+        stale_ttl: float = 3600
+    ):
+        """
+        Args:
+            max_entries: Максимум записей (старые вытесняются по LRU)
+            ttls: Время жизни по типам ресурсов (дополняет DEFAULT_TTLS)
+            default_ttl: Время жизни для ресурсов без отдельного TTL
+            stale_ttl: Сколько секунд после истечения TTL можно отдавать
+                устаревшее значение, пока идёт фоновое обновление
+        """
+        self.max_entries = max_entries
+        self.ttls = {**self.DEFAULT_TTLS, **(ttls or {})}
+        self.default_ttl = default_ttl
+        self.stale_ttl = stale_ttl
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(login: str, resource: str, params: Any) -> str:
+        """Ключ кэша по логину, ресурсу и параметрам запроса (включая даты)"""
+        raw = json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+        digest = hashlib.sha1(raw.encode()).hexdigest()
+        return f"{login}:{resource}:{digest}"
+
+    def ttl_for(self, resource: str) -> float:
+        return self.ttls.get(resource, self.default_ttl)
+
+    def lookup(self, key: str) -> Optional[CacheEntry]:
+        """
+        Найти запись, которую ещё можно отдать (свежую или устаревшую)
+
+        Returns:
+            CacheEntry или None, если записи нет или она истекла полностью
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.is_expired:
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def peek(self, key: str) -> Optional[Any]:
+        """
+        Любое сохранённое значение, даже полностью истекшее
+
+        Используется, когда запросить свежие данные нельзя
+        (кончились баллы API или запрос завершился ошибкой).
+        Истекшие записи остаются в кэше, пока их не вытеснит LRU.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry.value if entry is not None else None
+
+    def get(self, key: str) -> Optional[Any]:
+        """Свежее значение или None"""
+        entry = self.lookup(key)
+        return entry.value if entry is not None and entry.is_fresh else None
+
+    def set(self, resource: str, key: str, value: Any):
+        """Сохранить значение с TTL ресурса"""
+        entry = CacheEntry(value, self.ttl_for(resource), self.stale_ttl)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def begin_refresh(self, key: str) -> bool:
+        """
+        Пометить запись как обновляемую
+
+        Returns:
+            True, если обновление нужно запустить этому вызывающему;
+            False, если оно уже идёт
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.refreshing:
+                return False
+            entry.refreshing = True
+            return True
+
+    def end_refresh(self, key: str):
+        """Снять пометку обновления (например, если обновление не удалось)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.refreshing = False
+
+    def invalidate(self, login: Optional[str] = None):
+        """Удалить все записи (или только записи одного логина)"""
+        with self._lock:
+            if login is None:
+                self._entries.clear()
+                return
+            prefix = f"{login}:"
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                del self._entries[key]
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,200 @@
+"""
+Push-канал живой статистики Yandex Direct (Server-Sent Events)
+Вместо опроса эндпоинтов каждым браузером дашборд подписывается на поток.
+На каждую пару (логин, окно) работает один фоновый обновитель: он
+периодически берёт дашборд через общий клиент (кэш, rollup'ы, объединение
+запросов) и рассылает подписчикам только изменившиеся показатели.
+Сколько бы зрителей ни было, обращений к Direct столько же, сколько
+у одного. Обновитель запускается с первым подписчиком и
+останавливается с последним.
+"""
+
+import json
+import asyncio
+import itertools
+from typing import AsyncIterator, Callable, Dict, List, Optional, Set, Tuple
+
+
+def stats_delta(previous: Dict, current: Dict) -> Optional[Dict]:
+    """
+    Разница двух дашбордов (результатов get_dashboard)
+
+    Returns:
+        {"totals": {изменившиеся итоги}, "campaigns": [кампании с
+        изменившимися полями], "removed": [Id]} или None, если ничего
+        не изменилось
+    """
+    delta: Dict = {}
+
+    totals = {
+        key: value for key, value in current.get("totals", {}).items()
+        if previous.get("totals", {}).get(key) != value
+    }
+    if totals:
+        delta["totals"] = totals
+
+    before = {campaign.get("Id"): campaign for campaign in previous.get("campaigns", [])}
+    changed = [campaign for campaign in current.get("campaigns", []) if before.get(campaign.get("Id")) != campaign]
+    if changed:
+        delta["campaigns"] = changed
+
+    current_ids = {campaign.get("Id") for campaign in current.get("campaigns", [])}
+    removed = [campaign_id for campaign_id in before if campaign_id not in current_ids]
+    if removed:
+        delta["removed"] = removed
+
+    if not delta:
+        return None
+    delta["date_from"] = current.get("date_from")
+    delta["date_to"] = current.get("date_to")
+    return delta
+
+
+def format_event(event: str, data: Dict, event_id: Optional[int] = None) -> bytes:
+    """Событие в формате text/event-stream"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False)}")
+    return ("\n".join(lines) + "\n\n").encode()
+
+
+class _Channel:
+    """Подписчики одной пары (логин, окно) и её последний снимок"""
+
+    def __init__(self):
+        self.subscribers: Set[asyncio.Queue] = set()
+        self.snapshot: Optional[Dict] = None
+        self.task: Optional[asyncio.Task] = None
+
+
+class StatsBroadcaster:
+    """
+    Рассылка изменений статистики подписчикам SSE
+    """
+
+    def __init__(
+        self,
+        get_client: Callable,
+        interval: float = 60,
+        heartbeat: float = 15,
+        queue_size: int = 16
+    ):
+        """
+        Args:
+            get_client: Функция login -> AsyncYandexDirectAPI
+            interval: Пауза между обновлениями, секунды. Пока данные
+                в кэше свежие, обновление не обращается к Direct.
+            heartbeat: Пауза между комментариями-пингами (не дают прокси
+                закрыть простаивающее соединение)
+            queue_size: Сколько событий копится у медленного подписчика;
+                при переполнении его очередь заменяется полным снимком
+        """
+        self.get_client = get_client
+        self.interval = interval
+        self.heartbeat = heartbeat
+        self.queue_size = queue_size
+        self._channels: Dict[Tuple[str, int], _Channel] = {}
+        self._ids = itertools.count(1)
+
+    def _publish(self, channel: _Channel, event: str, data: Dict):
+        """Отправить событие всем подписчикам канала"""
+        message = format_event(event, data, next(self._ids))
+        for queue in channel.subscribers:
+            if not queue.full():
+                queue.put_nowait(message)
+                continue
+            # Подписчик не успевает читать: пропущенные дельты заменяет снимок
+            while not queue.empty():
+                queue.get_nowait()
+            if channel.snapshot is not None and event != "snapshot":
+                queue.put_nowait(format_event("snapshot", channel.snapshot, next(self._ids)))
+            else:
+                queue.put_nowait(message)
+
+    async def refresh(self, key: Tuple[str, int]) -> Optional[Dict]:
+        """
+        Обновить дашборд канала и разослать изменения
+
+        Returns:
+            Разница с предыдущим снимком или None
+        """
+        channel = self._channels.get(key)
+        if channel is None:
+            return None
+
+        login, days = key
+        dashboard = await self.get_client(login).get_dashboard(days=days)
+        if "error" in dashboard:
+            self._publish(channel, "error", dashboard)
+            return None
+
+        previous, channel.snapshot = channel.snapshot, dashboard
+        if previous is None:
+            self._publish(channel, "snapshot", dashboard)
+            return None
+
+        delta = stats_delta(previous, dashboard)
+        if delta is not None:
+            self._publish(channel, "stats", delta)
+        return delta
+
+    async def _run(self, key: Tuple[str, int]):
+        """Обновлять канал, пока у него есть подписчики"""
+        while True:
+            try:
+                await self.refresh(key)
+            except Exception as e:
+                print(f"Error refreshing stats for {key[0]}: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def subscribe(self, login: str, days: int = 30) -> AsyncIterator[bytes]:
+        """
+        Поток событий для одного подписчика
+
+        Сначала приходит снимок (event: snapshot), затем только
+        изменения (event: stats). Поток заканчивается, когда клиент
+        отключается и генератор закрывается.
+        """
+        key = (login, days)
+        channel = self._channels.setdefault(key, _Channel())
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        channel.subscribers.add(queue)
+
+        if channel.snapshot is not None:
+            queue.put_nowait(format_event("snapshot", channel.snapshot, next(self._ids)))
+        if channel.task is None or channel.task.done():
+            channel.task = asyncio.create_task(self._run(key))
+
+        try:
+            # Переподключение EventSource через 5 секунд после обрыва
+            yield b"retry: 5000\n\n"
+            while True:
+                try:
+                    yield await asyncio.wait_for(queue.get(), timeout=self.heartbeat)
+                except asyncio.TimeoutError:
+                    yield b": ping\n\n"
+        finally:
+            channel.subscribers.discard(queue)
+            if not channel.subscribers:
+                if channel.task is not None:
+                    channel.task.cancel()
+                self._channels.pop(key, None)
+
+    async def close(self):
+        """Остановить все обновители"""
+        tasks: List[asyncio.Task] = [channel.task for channel in self._channels.values() if channel.task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._channels.clear()
+
+    def status(self) -> Dict:
+        return {
+            "interval": self.interval,
+            "channels": {
+                f"{login}:{days}": len(channel.subscribers)
+                for (login, days), channel in self._channels.items()
+            }
+        }
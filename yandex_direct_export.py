@@ -0,0 +1,166 @@
+"""
+Потоковый экспорт отчётов Yandex Direct
+Строки отчёта сразу превращаются в блоки байт для ответа HTTP
+(chunked) - без временного файла и без всего отчёта в памяти.
+Форматы: CSV и, если установлен pyarrow, Parquet.
+"""
+
+import io
+import csv
+from typing import AsyncIterable, AsyncIterator, Dict, Iterable, Iterator, List, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow не обязателен: без него доступен только CSV
+    pa = None
+    pq = None
+
+
+class CsvChunkWriter:
+    """
+    CSV по блокам: write() копит строки, flush() отдаёт накопленные байты
+    """
+
+    media_type = "text/csv; charset=utf-8"
+    extension = "csv"
+
+    def __init__(self, fields: Optional[List[str]] = None):
+        """
+        Args:
+            fields: Заголовки столбцов (если None - по ключам первой строки)
+        """
+        self.fields = list(fields) if fields else None
+        self._buffer = io.StringIO()
+        self._writer: Optional[csv.DictWriter] = None
+
+    def _start(self, fields: List[str]):
+        self._writer = csv.DictWriter(self._buffer, fieldnames=fields, extrasaction="ignore")
+        self._writer.writeheader()
+
+    def write(self, row: Dict):
+        if self._writer is None:
+            self._start(self.fields or list(row.keys()))
+        self._writer.writerow(row)
+
+    def flush(self) -> bytes:
+        """Байты, накопленные с прошлого flush()"""
+        data = self._buffer.getvalue().encode("utf-8")
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return data
+
+    def close(self) -> bytes:
+        """Остаток файла (для пустого отчёта - только заголовок)"""
+        if self._writer is None and self.fields:
+            self._start(self.fields)
+        return self.flush()
+
+
+class ParquetChunkWriter:
+    """
+    Parquet по блокам: каждая пачка строк становится row group,
+    футер файла пишется в close()
+    """
+
+    media_type = "application/vnd.apache.parquet"
+    extension = "parquet"
+
+    def __init__(self, fields: Optional[List[str]] = None):
+        """
+        Args:
+            fields: Столбцы (если None - по ключам первой строки)
+        """
+        if pa is None:
+            raise RuntimeError("Parquet export requires pyarrow")
+        self.fields = list(fields) if fields else None
+        self._columns: Optional[Dict[str, list]] = None
+        self._sink = io.BytesIO()
+        self._writer = None
+
+    def write(self, row: Dict):
+        if self._columns is None:
+            self.fields = self.fields or list(row.keys())
+            self._columns = {field: [] for field in self.fields}
+        for field, values in self._columns.items():
+            values.append(row.get(field))
+
+    def _drain(self) -> bytes:
+        data = self._sink.getvalue()
+        self._sink.seek(0)
+        self._sink.truncate()
+        return data
+
+    def flush(self) -> bytes:
+        """Записать накопленные строки как row group и отдать байты"""
+        if not self._columns or not next(iter(self._columns.values())):
+            return self._drain()
+
+        table = pa.Table.from_pydict(self._columns)
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self._sink, table.schema)
+        self._writer.write_table(table)
+        self._columns = {field: [] for field in self.fields}
+        return self._drain()
+
+    def close(self) -> bytes:
+        """Последний row group и футер файла"""
+        data = self.flush()
+        if self._writer is None:
+            # Пустой отчёт: файл со схемой из строковых столбцов
+            schema = pa.schema([(field, pa.string()) for field in self.fields or []])
+            self._writer = pq.ParquetWriter(self._sink, schema)
+        self._writer.close()
+        return data + self._drain()
+
+
+EXPORT_WRITERS = {
+    "csv": CsvChunkWriter,
+    "parquet": ParquetChunkWriter
+}
+
+
+def export_formats() -> List[str]:
+    """Доступные форматы экспорта"""
+    return [name for name in EXPORT_WRITERS if name != "parquet" or pa is not None]
+
+
+def create_writer(export_format: str, fields: Optional[List[str]] = None):
+    """
+    Создать writer формата
+
+    Raises:
+        ValueError: Формат неизвестен или недоступен
+    """
+    if export_format not in export_formats():
+        raise ValueError(f"Unsupported export format: {export_format}")
+    return EXPORT_WRITERS[export_format](fields)
+
+
+def export_chunks(rows: Iterable[Dict], writer, chunk_rows: int = 1000) -> Iterator[bytes]:
+    """
+    Блоки файла экспорта по мере чтения строк
+
+    Args:
+        rows: Строки отчёта
+        writer: CsvChunkWriter или ParquetChunkWriter
+        chunk_rows: Сколько строк копить перед отправкой блока
+    """
+    count = 0
+    for row in rows:
+        writer.write(row)
+        count += 1
+        if count % chunk_rows == 0:
+            yield writer.flush()
+    yield writer.close()
+
+
+async def aexport_chunks(rows: AsyncIterable[Dict], writer, chunk_rows: int = 1000) -> AsyncIterator[bytes]:
+    """Асинхронный вариант export_chunks"""
+    count = 0
+    async for row in rows:
+        writer.write(row)
+        count += 1
+        if count % chunk_rows == 0:
+            yield writer.flush()
+    yield writer.close()
@@ -0,0 +1,101 @@
+"""
+Объединение одинаковых одновременных запросов (single-flight)
+Если такой же запрос к Direct уже выполняется, новый вызов не идёт
+к API, а ждёт и получает тот же результат (или ту же ошибку).
+"""
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+class _Call:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Single-flight для потоков
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        """
+        Выполнить fn() или дождаться уже идущего вызова с тем же ключом
+
+        Raises:
+            Исключение fn() - и у первого вызова, и у ожидавших
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            call.value = fn()
+            return call.value
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def in_flight(self) -> int:
+        """Сколько вызовов выполняется сейчас"""
+        return len(self._calls)
+
+
+class AsyncSingleFlight:
+    """
+    Single-flight для asyncio
+
+    Вызов выполняется отдельной задачей: если первый вызвавший
+    отменён (например, клиент закрыл соединение), остальные
+    всё равно получат результат.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Task] = {}
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Исключение забираем здесь, чтобы asyncio не ругался,
+        # если все ожидавшие уже отменены
+        if not task.cancelled():
+            task.exception()
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Выполнить await fn() или дождаться уже идущего вызова с тем же ключом
+
+        Raises:
+            Исключение fn() - и у первого вызова, и у ожидавших
+        """
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        return await asyncio.shield(task)
+
+    def in_flight(self) -> int:
+        """Сколько вызовов выполняется сейчас"""
+        return len(self._calls)
@@ -0,0 +1,57 @@
+"""
+Условные ответы HTTP для эндпоинтов Yandex Direct
+ETag - хэш тела ответа: если у браузера или CDN уже есть такое тело
+(If-None-Match), отдаётся 304 без тела. Cache-Control с s-maxage
+позволяет CDN отвечать на повторные запросы, не вызывая функцию.
+"""
+
+import hashlib
+from typing import Dict, Optional
+
+
+# Политики кэширования по эндпоинтам: max-age для браузера,
+# s-maxage для CDN, stale-while-revalidate - сколько CDN может
+# отдавать устаревший ответ, пока обновляет его в фоне
+CACHE_POLICIES = {
+    "dashboard": "public, max-age=60, s-maxage=300, stale-while-revalidate=600",
+    "stats": "public, max-age=60, s-maxage=300, stale-while-revalidate=600",
+    "campaigns": "public, max-age=60, s-maxage=300, stale-while-revalidate=600",
+    "report": "public, max-age=300, s-maxage=900, stale-while-revalidate=1800",
+    "summary": "public, max-age=300, s-maxage=900, stale-while-revalidate=1800",
+    "snapshot": "public, max-age=60, s-maxage=300",
+    "agency": "public, max-age=60, s-maxage=300",
+    "adgroups": "public, max-age=60, s-maxage=300"
+}
+
+# Ответы, которые нельзя кэшировать (ошибки, состояние лимитов, задания)
+NO_STORE = "no-store"
+
+
+def etag(body: bytes) -> str:
+    """Сильный ETag по содержимому тела"""
+    return '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], value: str) -> bool:
+    """
+    Совпадает ли ETag с заголовком If-None-Match
+
+    Заголовок может содержать несколько ETag через запятую, "*"
+    или слабые ETag (W/"...") - для GET они сравниваются как обычные.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return value in (tag[2:] if tag.startswith("W/") else tag for tag in candidates)
+
+
+def cache_control(endpoint: str) -> str:
+    """Cache-Control эндпоинта (no-store, если политика не задана)"""
+    return CACHE_POLICIES.get(endpoint, NO_STORE)
+
+
+def conditional_headers(body: bytes, endpoint: str) -> Dict[str, str]:
+    """Заголовки ETag и Cache-Control успешного ответа"""
+    return {"ETag": etag(body), "Cache-Control": cache_control(endpoint)}
@@ -0,0 +1,181 @@
+"""
+Учёт баллов Yandex Direct API и ограничение частоты запросов
+Direct списывает баллы за каждый запрос и сообщает остаток в заголовке
+Units ("израсходовано/осталось/суточный лимит"). Лимитер хранит остаток
+по каждому логину и планирует запросы через token bucket.
+"""
+
+import time
+import threading
+from typing import Dict, Optional, Tuple
+
+
+# Код ошибки API "Недостаточно баллов"
+NOT_ENOUGH_UNITS_ERROR = 152
+
+
+def parse_units(value: Optional[str]) -> Optional[Tuple[int, int, int]]:
+    """
+    Разобрать заголовок Units
+
+    Args:
+        value: Значение вида "10/20828/64000"
+
+    Returns:
+        (израсходовано, осталось, суточный лимит) или None
+    """
+    if not value:
+        return None
+    try:
+        spent, remaining, daily_limit = (int(part) for part in value.split("/"))
+    except ValueError:
+        return None
+    return spent, remaining, daily_limit
+
+
+class UnitsBudget:
+    """
+    Последние известные баллы логина
+    """
+
+    __slots__ = ("spent", "remaining", "daily_limit", "updated_at")
+
+    def __init__(self, spent: int, remaining: int, daily_limit: int):
+        self.spent = spent
+        self.remaining = remaining
+        self.daily_limit = daily_limit
+        self.updated_at = time.time()
+
+    def to_dict(self) -> Dict:
+        return {
+            "spent": self.spent,
+            "remaining": self.remaining,
+            "daily_limit": self.daily_limit,
+            "updated_at": self.updated_at
+        }
+
+
+class TokenBucket:
+    """
+    Token bucket: rate запросов в секунду с запасом capacity
+
+    reserve() не блокирует, а сразу занимает токен и возвращает,
+    сколько нужно подождать - так запросы выстраиваются в очередь.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        """
+        Занять токены
+
+        Returns:
+            Сколько секунд подождать перед запросом
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+
+class UnitsLimiter:
+    """
+    Лимитер запросов с учётом баллов API по логинам
+
+    Один экземпляр можно разделять между клиентами разных логинов.
+    """
+
+    def __init__(
+        self,
+        requests_per_second: float = 5.0,
+        burst: float = 10,
+        low_units: int = 1000,
+        budget_ttl: float = 3600
+    ):
+        """
+        Args:
+            requests_per_second: Частота запросов одного логина
+            burst: Сколько запросов можно отправить подряд без ожидания
+            low_units: Остаток баллов, ниже которого клиент отдаёт
+                данные из кэша вместо новых запросов
+            budget_ttl: Сколько секунд доверять известному остатку
+                (баллы восстанавливаются в течение суток)
+        """
+        self.requests_per_second = requests_per_second
+        self.burst = burst
+        self.low_units = low_units
+        self.budget_ttl = budget_ttl
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._rates: Dict[str, Tuple[float, float]] = {}
+        self._budgets: Dict[str, UnitsBudget] = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, login: str) -> TokenBucket:
+        with self._lock:
+            bucket = self._buckets.get(login)
+            if bucket is None:
+                rate, capacity = self._rates.get(login, (self.requests_per_second, self.burst))
+                bucket = self._buckets[login] = TokenBucket(rate, capacity)
+            return bucket
+
+    def configure(self, login: str, requests_per_second: Optional[float] = None, burst: Optional[float] = None):
+        """Задать логину свою частоту запросов вместо общей"""
+        with self._lock:
+            rate = (
+                requests_per_second if requests_per_second is not None else self.requests_per_second,
+                burst if burst is not None else self.burst
+            )
+            self._rates[login] = rate
+            self._buckets[login] = TokenBucket(*rate)
+
+    def reserve(self, login: str) -> float:
+        """
+        Занять место в очереди запросов логина
+
+        Returns:
+            Сколько секунд подождать перед запросом
+        """
+        return self._bucket(login).reserve()
+
+    def update(self, login: str, units_header: Optional[str]):
+        """Запомнить остаток баллов из заголовка Units"""
+        units = parse_units(units_header)
+        if units is not None:
+            with self._lock:
+                self._budgets[login] = UnitsBudget(*units)
+
+    def exhaust(self, login: str):
+        """Отметить, что баллы логина закончились (ошибка 152)"""
+        with self._lock:
+            budget = self._budgets.get(login)
+            daily_limit = budget.daily_limit if budget else 0
+            spent = budget.spent if budget else 0
+            self._budgets[login] = UnitsBudget(spent, 0, daily_limit)
+
+    def budget(self, login: str) -> Optional[UnitsBudget]:
+        """Последний известный остаток баллов логина"""
+        return self._budgets.get(login)
+
+    def is_low(self, login: str) -> bool:
+        """Баллов мало - лучше отдать данные из кэша"""
+        budget = self._budgets.get(login)
+        if budget is None or time.time() - budget.updated_at > self.budget_ttl:
+            return False
+        return budget.remaining < self.low_units
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Остатки баллов по всем логинам"""
+        with self._lock:
+            return {
+                login: {**budget.to_dict(), "is_low": self.is_low(login)}
+                for login, budget in self._budgets.items()
+            }
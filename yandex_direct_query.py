@@ -0,0 +1,216 @@
+"""
+Построитель запросов к Yandex Direct Reports
+Запрашиваются только нужные поля: производные метрики (CTR, CPC и т.п.)
+считаются на клиенте из сумм, фильтры уходят в Reports, а тип отчёта
+выбирается самый крупный из подходящих по полям.
+"""
+
+import json
+from typing import Dict, Iterable, Iterator, List, Optional
+
+
+class ReportQuery:
+    """
+    Параметры отчёта: поля, фильтры, гранулярность по датам и тип отчёта
+    """
+
+    # Гранулярность -> поле даты в Reports ("total" - без разбивки по датам)
+    GRAIN_FIELDS = {
+        "day": "Date",
+        "week": "Week",
+        "month": "Month",
+        "quarter": "Quarter",
+        "year": "Year"
+    }
+
+    # Производная метрика -> (числитель, знаменатель, множитель)
+    DERIVED_FIELDS = {
+        "Ctr": ("Clicks", "Impressions", 100),
+        "AvgCpc": ("Cost", "Clicks", 1),
+        "ConversionRate": ("Conversions", "Clicks", 100),
+        "CostPerConversion": ("Cost", "Conversions", 1)
+    }
+
+    # Типы отчётов от крупного к детальному и поля, которые появляются на каждом уровне
+    REPORT_TYPES = [
+        ("ACCOUNT_PERFORMANCE_REPORT", set()),
+        ("CAMPAIGN_PERFORMANCE_REPORT", {"CampaignId", "CampaignName", "CampaignType", "CampaignUrlPath"}),
+        ("ADGROUP_PERFORMANCE_REPORT", {"AdGroupId", "AdGroupName"}),
+        ("AD_PERFORMANCE_REPORT", {"AdId", "AdFormat"}),
+        ("CRITERIA_PERFORMANCE_REPORT", {"CriterionId", "Criterion", "CriterionType"}),
+        ("SEARCH_QUERY_PERFORMANCE_REPORT", {"Query"})
+    ]
+
+    def __init__(
+        self,
+        fields: Iterable[str],
+        campaign_ids: Optional[List[int]] = None,
+        campaign_states: Optional[List[str]] = None,
+        min_impressions: Optional[int] = None,
+        grain: Optional[str] = None,
+        filters: Optional[List[Dict]] = None,
+        report_type: Optional[str] = None
+    ):
+        """
+        Args:
+            fields: Поля в ответе (в том числе производные метрики)
+            campaign_ids: Список ID кампаний
+            campaign_states: Состояния кампаний (ON, SUSPENDED, ...);
+                клиент превращает их в список ID через campaigns.get
+            min_impressions: Отбросить строки, где показов меньше
+            grain: Разбивка по датам: day, week, month, quarter, year
+                или total (без разбивки); None - как в fields
+            filters: Дополнительные фильтры Reports (Field/Operator/Values)
+            report_type: Тип отчёта (если None - выбирается по полям)
+        """
+        if grain is not None and grain != "total" and grain not in self.GRAIN_FIELDS:
+            raise ValueError(f"Unknown grain: {grain}")
+
+        self.fields = self._apply_grain(list(fields), grain)
+        self.campaign_ids = campaign_ids
+        self.campaign_states = campaign_states
+        self.min_impressions = min_impressions
+        self.grain = grain
+        self.extra_filters = list(filters or [])
+        self._report_type = report_type
+
+        # Поля для выгрузки: без производных метрик, но с их слагаемыми
+        self.derived = [field for field in self.fields if field in self.DERIVED_FIELDS]
+        api_fields: List[str] = []
+        for field in self.fields:
+            inputs = self.DERIVED_FIELDS[field][:2] if field in self.DERIVED_FIELDS else (field,)
+            api_fields.extend(name for name in inputs if name not in api_fields)
+        self.api_fields = api_fields
+
+    def _apply_grain(self, fields: List[str], grain: Optional[str]) -> List[str]:
+        """Заменить поле даты на поле выбранной гранулярности"""
+        if grain is None:
+            return fields
+
+        grain_fields = set(self.GRAIN_FIELDS.values())
+        position = next((i for i, field in enumerate(fields) if field in grain_fields), 0)
+        fields = [field for field in fields if field not in grain_fields]
+        if grain != "total":
+            fields.insert(position, self.GRAIN_FIELDS[grain])
+        return fields
+
+    @property
+    def is_empty(self) -> bool:
+        """Фильтр по кампаниям не оставил ни одной кампании"""
+        return self.campaign_ids is not None and not self.campaign_ids
+
+    @property
+    def has_day_grain(self) -> bool:
+        """Есть разбивка по дням (такой отчёт можно хранить по дням)"""
+        return "Date" in self.api_fields
+
+    def filters(self) -> List[Dict]:
+        """Фильтры SelectionCriteria.Filter"""
+        filters = []
+        if self.campaign_ids:
+            filters.append({"Field": "CampaignId", "Operator": "IN", "Values": [str(i) for i in self.campaign_ids]})
+        if self.min_impressions:
+            filters.append({
+                "Field": "Impressions",
+                "Operator": "GREATER_THAN",
+                "Values": [str(self.min_impressions - 1)]
+            })
+        return filters + self.extra_filters
+
+    @property
+    def report_type(self) -> str:
+        """Самый крупный тип отчёта, в котором есть все поля и поля фильтров"""
+        if self._report_type:
+            return self._report_type
+
+        dimensions = {field for _, level_fields in self.REPORT_TYPES for field in level_fields}
+        needed = (set(self.api_fields) | {item["Field"] for item in self.filters()}) & dimensions
+        available = set()
+        for report_type, level_fields in self.REPORT_TYPES:
+            available |= level_fields
+            if needed <= available:
+                return report_type
+        return self.REPORT_TYPES[-1][0]
+
+    def to_params(self, date_from: str, date_to: str) -> Dict:
+        """Параметры отчёта (без ReportName)"""
+        params = {
+            "SelectionCriteria": {
+                "DateFrom": date_from,
+                "DateTo": date_to
+            },
+            "FieldNames": list(self.api_fields),
+            "ReportType": self.report_type,
+            "DateRangeType": "CUSTOM_DATE",
+            "Format": "TSV",
+            # Расход с НДС и без скидки - одинаково для бэкенда и функций Vercel
+            "IncludeVAT": "YES",
+            "IncludeDiscount": "NO"
+        }
+
+        filters = self.filters()
+        if filters:
+            params["SelectionCriteria"]["Filter"] = filters
+
+        return params
+
+    def key(self) -> Dict:
+        """Параметры, от которых зависят строки отчёта (для ключей кэша)"""
+        return {
+            "fields": self.fields,
+            "campaign_ids": self.campaign_ids,
+            "campaign_states": self.campaign_states,
+            "filters": self.filters(),
+            "report_type": self.report_type
+        }
+
+    def store_filters(self) -> Optional[str]:
+        """Фильтры, кроме фильтра по кампаниям, для ключа ReportStore"""
+        filters = [item for item in self.filters() if item["Field"] != "CampaignId"]
+        if not filters and self._report_type is None:
+            return None
+        return json.dumps([filters, self.report_type], sort_keys=True)
+
+    def restrict(self, campaign_ids: List[int]) -> "ReportQuery":
+        """
+        Тот же запрос по заданным кампаниям (после разбора campaign_states)
+        """
+        if self.campaign_ids is not None:
+            allowed = set(self.campaign_ids)
+            campaign_ids = [i for i in campaign_ids if i in allowed]
+
+        query = ReportQuery(
+            self.fields,
+            campaign_ids=campaign_ids,
+            min_impressions=self.min_impressions,
+            filters=self.extra_filters,
+            report_type=self._report_type
+        )
+        query.grain = self.grain
+        return query
+
+    @property
+    def needs_projection(self) -> bool:
+        """Строки Reports нужно дополнить производными метриками или переупорядочить"""
+        return bool(self.derived) or self.fields != self.api_fields
+
+    def project_row(self, row: Dict) -> Dict:
+        """Строка в порядке fields с посчитанными производными метриками"""
+        if not self.needs_projection:
+            return row
+
+        result = {}
+        for field in self.fields:
+            if field in self.DERIVED_FIELDS:
+                numerator, denominator, scale = self.DERIVED_FIELDS[field]
+                total = row.get(denominator) or 0
+                result[field] = round(row.get(numerator, 0) / total * scale, 2) if total else 0.0
+            else:
+                result[field] = row.get(field)
+        return result
+
+    def project(self, rows: Iterable[Dict]) -> Iterator[Dict]:
+        """Строки отчёта в порядке fields с посчитанными производными метриками"""
+        if not self.needs_projection:
+            return iter(rows)
+        return (self.project_row(row) for row in rows)
@@ -0,0 +1,122 @@
+"""
+Реестр клиентов Yandex Direct по логинам
+Один бэкенд обслуживает несколько логинов рекламодателей: клиент каждого
+логина создаётся один раз и переиспользуется, пока к нему обращаются.
+Соединения, кэш и лимитер общие - их передаёт фабрика клиентов.
+"""
+
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+from yandex_direct_limits import UnitsLimiter
+
+
+class ClientRegistry:
+    """
+    Клиенты Direct по логинам с вытеснением простаивающих
+
+    Фабрика должна создавать клиентов поверх общего пула соединений
+    (session / http_client), тогда вытеснение клиента ничего не закрывает,
+    а только освобождает объект; кэш и остаток баллов хранятся по логину
+    в общих TTLCache и UnitsLimiter и переживают вытеснение.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[str, str], Any],
+        limiter: Optional[UnitsLimiter] = None,
+        idle_ttl: float = 1800,
+        max_clients: int = 256
+    ):
+        """
+        Args:
+            factory: Создаёт клиента по (токен, логин)
+            limiter: Общий лимитер (для частоты запросов отдельных логинов)
+            idle_ttl: Через сколько секунд без обращений клиент вытесняется
+            max_clients: Максимум клиентов (лишние вытесняются по LRU)
+        """
+        self.factory = factory
+        self.limiter = limiter
+        self.idle_ttl = idle_ttl
+        self.max_clients = max_clients
+        self._tokens: Dict[str, str] = {}
+        self._clients: "OrderedDict[str, Any]" = OrderedDict()
+        self._last_used: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def register(self, login: str, token: str, requests_per_second: Optional[float] = None, burst: Optional[float] = None):
+        """
+        Добавить логин и его токен
+
+        Args:
+            login: Логин клиента в Яндекс.Директ
+            token: OAuth токен (для клиентов агентства - токен агентства)
+            requests_per_second: Своя частота запросов логина
+            burst: Свой запас запросов подряд
+        """
+        with self._lock:
+            if self._tokens.get(login) != token:
+                # Токен сменился - старый клиент больше не годится
+                self._clients.pop(login, None)
+            self._tokens[login] = token
+
+        if self.limiter is not None and (requests_per_second is not None or burst is not None):
+            self.limiter.configure(login, requests_per_second, burst)
+
+    def logins(self) -> List[str]:
+        """Зарегистрированные логины"""
+        return list(self._tokens)
+
+    def __contains__(self, login: str) -> bool:
+        return login in self._tokens
+
+    def get(self, login: str) -> Any:
+        """
+        Клиент логина (создаётся при первом обращении)
+
+        Raises:
+            KeyError: Логин не зарегистрирован
+        """
+        now = time.monotonic()
+        with self._lock:
+            token = self._tokens[login]
+            self._evict_idle(now)
+
+            client = self._clients.get(login)
+            if client is None:
+                client = self._clients[login] = self.factory(token, login)
+            self._clients.move_to_end(login)
+            self._last_used[login] = now
+
+            while len(self._clients) > self.max_clients:
+                evicted, _ = self._clients.popitem(last=False)
+                self._last_used.pop(evicted, None)
+
+            return client
+
+    def evict_idle(self) -> List[str]:
+        """
+        Вытеснить клиентов, к которым давно не обращались
+
+        Returns:
+            Логины вытесненных клиентов
+        """
+        with self._lock:
+            return self._evict_idle(time.monotonic())
+
+    def _evict_idle(self, now: float) -> List[str]:
+        idle = [login for login, used in self._last_used.items() if now - used > self.idle_ttl]
+        for login in idle:
+            self._clients.pop(login, None)
+            del self._last_used[login]
+        return idle
+
+    def clients(self) -> List[Any]:
+        """Клиенты, которые сейчас в реестре"""
+        with self._lock:
+            return list(self._clients.values())
+
+    def __len__(self) -> int:
+        return len(self._clients)
@@ -0,0 +1,252 @@
+"""
+Разбор отчётов Yandex Direct Reports
+Потоковый парсер TSV: строки разбираются по мере чтения ответа,
+числовые поля сразу приводятся к int/float.
+TsvBytesParser разбирает ответ прямо из байтовых блоков: числа читаются
+из bytes без промежуточных str, декодируются только текстовые поля.
+"""
+
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+
+# Типы полей Reports (остальные поля остаются строками)
+INT_FIELDS = {
+    "CampaignId", "AdGroupId", "AdId", "CriterionId", "ClientId",
+    "Impressions", "Clicks", "Conversions", "Sessions", "Bounces"
+}
+
+FLOAT_FIELDS = {
+    "Cost", "Ctr", "AvgCpc", "ConversionRate", "CostPerConversion",
+    "AvgImpressionPosition", "AvgClickPosition", "AvgTrafficVolume",
+    "AvgEffectiveBid", "AvgPageviews", "BounceRate", "Revenue",
+    "GoalsRoi", "Profit", "WeightedImpressions", "WeightedCtr"
+}
+
+# Reports пишет "--", если значения нет
+EMPTY_BYTES = b"--"
+
+
+def _bytes_to_int(value: bytes) -> int:
+    return 0 if value == EMPTY_BYTES or not value else int(value)
+
+
+def _bytes_to_float(value: bytes) -> float:
+    return 0.0 if value == EMPTY_BYTES or not value else float(value)
+
+
+def _bytes_to_text(value: bytes) -> Optional[str]:
+    return None if value == EMPTY_BYTES else value.decode("utf-8")
+
+
+def bytes_converter(field: str) -> Callable[[bytes], object]:
+    """Функция приведения значения поля из bytes (int() и float() читают bytes напрямую)"""
+    if field in INT_FIELDS:
+        return _bytes_to_int
+    if field in FLOAT_FIELDS:
+        return _bytes_to_float
+    return _bytes_to_text
+
+
+class TsvBytesParser:
+    """
+    Парсер TSV отчёта из байтовых блоков ответа
+
+    Блоки режутся по b"\n" и b"\t"; неполная последняя строка блока
+    переносится в следующий. Числовые значения приводятся из bytes,
+    в str декодируются только текстовые поля.
+    """
+
+    def __init__(self):
+        self.columns: Optional[List[str]] = None
+        self._converters: List[Callable[[bytes], object]] = []
+        self._tail = b""
+
+    def _parse(self, line: bytes) -> Optional[List]:
+        if line.endswith(b"\r"):
+            line = line[:-1]
+        if not line:
+            return None
+
+        values = line.split(b"\t")
+
+        if self.columns is None:
+            self.columns = [value.decode("utf-8") for value in values]
+            self._converters = [bytes_converter(field) for field in self.columns]
+            return None
+
+        return [convert(value) for convert, value in zip(self._converters, values)]
+
+    def feed(self, chunk: bytes) -> List[List]:
+        """
+        Разобрать очередной блок ответа
+
+        Returns:
+            Типизированные значения полных строк блока (без заголовка)
+        """
+        lines = (self._tail + chunk if self._tail else chunk).split(b"\n")
+        self._tail = lines.pop()
+        return [values for values in map(self._parse, lines) if values is not None]
+
+    def close(self) -> List[List]:
+        """Разобрать остаток ответа после последнего блока"""
+        tail, self._tail = self._tail, b""
+        values = self._parse(tail)
+        return [values] if values is not None else []
+
+    def to_dicts(self, rows: List[List]) -> List[Dict]:
+        """Строки в виде словарей по заголовкам"""
+        columns = self.columns
+        return [dict(zip(columns, values)) for values in rows]
+
+
+def iter_tsv_chunks(chunks: Iterable[bytes]) -> Iterator[Dict]:
+    """
+    Разобрать TSV отчёт из байтовых блоков
+
+    Args:
+        chunks: Блоки ответа (iter_content() и т.п.)
+
+    Yields:
+        Строки отчёта с типизированными значениями
+    """
+    parser = TsvBytesParser()
+    for chunk in chunks:
+        yield from parser.to_dicts(parser.feed(chunk))
+    yield from parser.to_dicts(parser.close())
+
+
+class MetricTotals:
+    """
+    Суммы показателей и производные метрики (взвешенные по суммам)
+    """
+
+    __slots__ = ("impressions", "clicks", "cost", "conversions")
+
+    def __init__(self):
+        self.impressions = 0
+        self.clicks = 0
+        self.cost = 0.0
+        self.conversions = 0
+
+    def add(self, impressions: int, clicks: int, cost: float, conversions: int):
+        self.impressions += impressions
+        self.clicks += clicks
+        self.cost += cost
+        self.conversions += conversions
+
+    @property
+    def ctr(self) -> float:
+        return (self.clicks / self.impressions * 100) if self.impressions > 0 else 0
+
+    @property
+    def avg_cpc(self) -> float:
+        return (self.cost / self.clicks) if self.clicks > 0 else 0
+
+    @property
+    def conversion_rate(self) -> float:
+        return (self.conversions / self.clicks * 100) if self.clicks > 0 else 0
+
+    def to_dict(self) -> Dict:
+        return {
+            "impressions": self.impressions,
+            "clicks": self.clicks,
+            "cost": round(self.cost, 2),
+            "conversions": self.conversions,
+            "ctr": round(self.ctr, 2),
+            "avg_cpc": round(self.avg_cpc, 2),
+            "conversion_rate": round(self.conversion_rate, 2)
+        }
+
+
+class ReportAggregator:
+    """
+    Агрегация отчёта за один проход
+
+    Считает итоги, взвешенные CTR/CPC/CR и разбивки по кампаниям и дням.
+    """
+
+    def __init__(self):
+        self.totals = MetricTotals()
+        self.by_campaign: Dict[int, MetricTotals] = {}
+        self.by_day: Dict[str, MetricTotals] = {}
+        self.campaign_names: Dict[int, Optional[str]] = {}
+
+    def _group(self, groups: Dict, key) -> MetricTotals:
+        totals = groups.get(key)
+        if totals is None:
+            totals = groups[key] = MetricTotals()
+        return totals
+
+    def add(self, row: Dict):
+        """Учесть строку отчёта"""
+        impressions = row.get("Impressions", 0)
+        clicks = row.get("Clicks", 0)
+        cost = row.get("Cost", 0)
+        conversions = row.get("Conversions", 0)
+
+        self.totals.add(impressions, clicks, cost, conversions)
+
+        campaign_id = row.get("CampaignId")
+        if campaign_id is not None:
+            self._group(self.by_campaign, campaign_id).add(impressions, clicks, cost, conversions)
+            if "CampaignName" in row:
+                self.campaign_names[campaign_id] = row["CampaignName"]
+
+        day = row.get("Date")
+        if day is not None:
+            self._group(self.by_day, day).add(impressions, clicks, cost, conversions)
+
+    def add_rows(self, rows: Iterable[Dict]) -> "ReportAggregator":
+        """Учесть все строки потока"""
+        for row in rows:
+            self.add(row)
+        return self
+
+    def merge(self, other: "ReportAggregator") -> "ReportAggregator":
+        """Добавить итоги другого агрегатора (например, другого клиента)"""
+        totals = other.totals
+        self.totals.add(totals.impressions, totals.clicks, totals.cost, totals.conversions)
+        for groups, other_groups in ((self.by_campaign, other.by_campaign), (self.by_day, other.by_day)):
+            for key, totals in other_groups.items():
+                self._group(groups, key).add(totals.impressions, totals.clicks, totals.cost, totals.conversions)
+        self.campaign_names.update(other.campaign_names)
+        return self
+
+    def dashboard_stats(self, date_from: str, date_to: str) -> Dict:
+        """Итоги в формате get_dashboard_stats"""
+        totals = self.totals
+        return {
+            "total_impressions": totals.impressions,
+            "total_clicks": totals.clicks,
+            "total_cost": round(totals.cost, 2),
+            "avg_ctr": round(totals.ctr, 2),
+            "avg_cpc": round(totals.avg_cpc, 2),
+            "total_conversions": totals.conversions,
+            "conversion_rate": round(totals.conversion_rate, 2),
+            "campaigns_count": len(self.by_campaign),
+            "period": f"{date_from} — {date_to}"
+        }
+
+    def campaigns(self) -> List[Dict]:
+        """Показатели по кампаниям, по убыванию расхода"""
+        result = [
+            {"id": campaign_id, "name": self.campaign_names.get(campaign_id), **totals.to_dict()}
+            for campaign_id, totals in self.by_campaign.items()
+        ]
+        result.sort(key=lambda campaign: campaign["cost"], reverse=True)
+        return result
+
+    def days(self) -> List[Dict]:
+        """Показатели по дням, по возрастанию даты"""
+        return [
+            {"date": day, **self.by_day[day].to_dict()}
+            for day in sorted(self.by_day)
+        ]
+
+    def to_dict(self) -> Dict:
+        """Итоги и разбивки по кампаниям и дням"""
+        return {
+            "totals": self.totals.to_dict(),
+            "campaigns": self.campaigns(),
+            "daily": self.days()
+        }
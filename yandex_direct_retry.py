@@ -0,0 +1,165 @@
+"""
+Повторы запросов и circuit breaker для Yandex Direct API
+Идемпотентные get-запросы повторяются с экспоненциальной задержкой
+и случайным разбросом (jitter). Если хост Direct раз за разом не отвечает,
+circuit breaker на время перестаёт отправлять к нему запросы.
+"""
+
+import time
+import random
+import threading
+from typing import Any, Dict, Optional
+
+
+# Коды ошибок Direct, после которых запрос имеет смысл повторить:
+# 52 - сервер временно недоступен, 152 - недостаточно баллов
+# (баллы восстанавливаются постепенно), 506 - превышено число
+# одновременных запросов, 1000-1002 - внутренние ошибки сервера
+RETRYABLE_ERRORS = {52, 152, 506, 1000, 1001, 1002}
+
+# Коды, повтор которых бесполезен: 53 - ошибка авторизации,
+# 54 - нет прав; сюда же относятся ошибки в параметрах запроса
+FATAL_ERRORS = {53, 54}
+
+
+def error_code(data: Any) -> Optional[int]:
+    """Код ошибки Direct из ответа или None"""
+    error = data.get("error") if isinstance(data, dict) else None
+    if not isinstance(error, dict):
+        return None
+    try:
+        return int(error.get("error_code"))
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """
+    Когда и через сколько повторять запрос
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 8,
+        retry_statuses=(429, 500, 502, 503, 504)
+    ):
+        """
+        Args:
+            max_attempts: Сколько всего попыток (1 - без повторов)
+            base_delay: Задержка перед первым повтором, секунды
+            max_delay: Максимальная задержка
+            retry_statuses: HTTP-статусы, после которых повторяем
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_statuses = set(retry_statuses)
+
+    def delay(self, attempt: int) -> float:
+        """
+        Задержка перед повтором номер attempt (с 0)
+
+        "Full jitter": случайное значение от 0 до экспоненциальной границы,
+        чтобы клиенты после общего сбоя не повторяли запросы одновременно.
+        """
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def should_retry(self, status: Optional[int], data: Any) -> bool:
+        """
+        Стоит ли повторять запрос
+
+        Args:
+            status: HTTP-статус (None - сетевая ошибка или таймаут)
+            data: Ответ API
+        """
+        code = error_code(data)
+        if code is not None:
+            return code in RETRYABLE_ERRORS
+        return status is None or status in self.retry_statuses
+
+    @staticmethod
+    def is_host_failure(status: Optional[int]) -> bool:
+        """Сбой на стороне хоста (учитывается circuit breaker'ом)"""
+        return status is None or status >= 500
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker одного хоста
+
+    После failure_threshold сбоев подряд запросы не отправляются
+    reset_timeout секунд; затем пропускается один пробный запрос.
+    Если результат пробы не записан за probe_timeout секунд (запрос
+    отменён или упал мимо record_*), пропускается следующая проба.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30, probe_timeout: float = 180):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.probe_timeout = probe_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probe_started: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """closed, open или half-open"""
+        with self._lock:
+            return self._state(time.monotonic())
+
+    def _state(self, now: float) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if now - self._opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        """Можно ли отправить запрос"""
+        with self._lock:
+            now = time.monotonic()
+            state = self._state(now)
+            if state == "closed":
+                return True
+            if state == "half-open" and (self._probe_started is None or now - self._probe_started >= self.probe_timeout):
+                self._probe_started = now
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probe_started = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probe_started = None
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+    def to_dict(self) -> Dict:
+        return {"state": self.state, "failures": self._failures}
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def circuit_breaker(host: str) -> CircuitBreaker:
+    """Общий circuit breaker хоста (один на процесс)"""
+    with _breakers_lock:
+        breaker = _breakers.get(host)
+        if breaker is None:
+            breaker = _breakers[host] = CircuitBreaker()
+        return breaker
+
+
+def breakers_snapshot() -> Dict[str, Dict]:
+    """Состояние circuit breaker'ов по хостам"""
+    with _breakers_lock:
+        return {host: breaker.to_dict() for host, breaker in _breakers.items()}
@@ -0,0 +1,329 @@
+"""
+Предрасчитанные итоги (rollups) отчётов Yandex Direct
+Показатели хранятся по кампаниям и дням вместе с накопленными суммами
+(prefix sums): итоги за любой период - это prefix[to] - prefix[from - 1],
+поэтому окна 7/30/90 дней и произвольные периоды считаются за O(кампаний),
+а не за O(строк). Новые дни добавляются инкрементально, а дни, которые
+Direct пересчитал, заменяются с пересчётом сумм только после них.
+"""
+
+import time
+import threading
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from yandex_direct_query import ReportQuery
+from yandex_direct_report import MetricTotals, ReportAggregator
+from yandex_direct_store import report_days, stale_ranges
+
+
+# Показатели в порядке хранения: (Impressions, Clicks, Cost, Conversions)
+METRICS = ("Impressions", "Clicks", "Cost", "Conversions")
+ZERO = (0, 0, 0.0, 0)
+
+
+def _add(left: Tuple, right: Tuple) -> Tuple:
+    return tuple(a + b for a, b in zip(left, right))
+
+
+def _sub(left: Tuple, right: Tuple) -> Tuple:
+    return tuple(a - b for a, b in zip(left, right))
+
+
+class DailySeries:
+    """
+    Показатели по дням и накопленные суммы
+
+    prefix[i] - сумма за первые i дней из days.
+    """
+
+    __slots__ = ("days", "values", "prefix")
+
+    def __init__(self):
+        self.days: List[str] = []
+        self.values: Dict[str, Tuple] = {}
+        self.prefix: List[Tuple] = [ZERO]
+
+    def replace(self, date_from: str, date_to: str, values: Dict[str, Tuple]):
+        """
+        Заменить дни периода и пересчитать суммы начиная с первого из них
+
+        Args:
+            values: День -> показатели (только дни внутри периода)
+        """
+        start = bisect_left(self.days, date_from)
+        end = bisect_right(self.days, date_to)
+        for day in self.days[start:end]:
+            del self.values[day]
+
+        self.values.update(values)
+        self.days[start:end] = sorted(values)
+
+        # Новые дни в конце: пересчитываются только их суммы
+        del self.prefix[start + 1:]
+        total = self.prefix[start]
+        for day in self.days[start:]:
+            total = _add(total, self.values[day])
+            self.prefix.append(total)
+
+    def window(self, date_from: str, date_to: str) -> Optional[Tuple]:
+        """Сумма за период или None, если за период нет строк"""
+        start = bisect_left(self.days, date_from)
+        end = bisect_right(self.days, date_to)
+        if start == end:
+            return None
+        return _sub(self.prefix[end], self.prefix[start])
+
+    def items(self, date_from: str, date_to: str) -> List[Tuple[str, Tuple]]:
+        """Показатели по дням периода"""
+        start = bisect_left(self.days, date_from)
+        end = bisect_right(self.days, date_to)
+        return [(day, self.values[day]) for day in self.days[start:end]]
+
+
+class RollupBatch:
+    """
+    Строки отчёта за период, свёрнутые по кампаниям и дням
+
+    Собирается без блокировок и применяется к ReportRollup целиком.
+    """
+
+    def __init__(self, date_from: str, date_to: str):
+        self.date_from = date_from
+        self.date_to = date_to
+        self.cells: Dict[int, Dict[str, List]] = {}
+        self.campaign_names: Dict[int, Optional[str]] = {}
+
+    def add(self, row: Dict):
+        """Учесть строку отчёта (нужны CampaignId и Date)"""
+        day = row.get("Date")
+        campaign_id = row.get("CampaignId")
+        if campaign_id is None or day is None or not self.date_from <= day <= self.date_to:
+            return
+
+        cell = self.cells.setdefault(campaign_id, {}).get(day)
+        if cell is None:
+            cell = self.cells[campaign_id][day] = [0, 0, 0.0, 0]
+        for index, field in enumerate(METRICS):
+            cell[index] += row.get(field) or 0
+
+        if "CampaignName" in row:
+            self.campaign_names[campaign_id] = row["CampaignName"]
+
+    def add_rows(self, rows: Iterable[Dict]) -> "RollupBatch":
+        """Учесть все строки потока"""
+        for row in rows:
+            self.add(row)
+        return self
+
+
+class ReportRollup:
+    """
+    Итоги одного логина по кампаниям и дням
+
+    Помнит, какие дни загружены и когда, чтобы перезапрашивать
+    только недостающие дни, сегодня и окно пересчёта Direct.
+    """
+
+    # Поля, которые можно получить из rollup без запроса к Reports
+    FIELDS = {"CampaignId", "CampaignName", "Date", *METRICS}
+
+    # Типы отчётов, где строка - это кампания (или аккаунт) за день
+    REPORT_TYPES = {"ACCOUNT_PERFORMANCE_REPORT", "CAMPAIGN_PERFORMANCE_REPORT"}
+
+    def __init__(self, restatement_days: int = 3, recent_ttl: float = 900):
+        """
+        Args:
+            restatement_days: Сколько последних дней Direct ещё может пересчитать
+            recent_ttl: Через сколько секунд перезапрашивать сегодня
+                и дни окна пересчёта
+        """
+        self.restatement_days = restatement_days
+        self.recent_ttl = recent_ttl
+        self.campaigns: Dict[int, DailySeries] = {}
+        self.account = DailySeries()
+        self.campaign_names: Dict[int, Optional[str]] = {}
+        self._fetched: Dict[str, float] = {}
+        self._refreshing: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def missing_ranges(self, date_from: str, date_to: str) -> List[Tuple[str, str]]:
+        """Диапазоны дат, которые нужно запросить у Direct"""
+        with self._lock:
+            return stale_ranges(self._fetched, date_from, date_to, self.restatement_days, self.recent_ttl)
+
+    def covers(self, date_from: str, date_to: str) -> bool:
+        """Все дни периода уже загружались (пусть и давно)"""
+        with self._lock:
+            return all(day in self._fetched for day in report_days(date_from, date_to))
+
+    def begin_refresh(self, key: str) -> bool:
+        """Отметить начало фонового обновления (False - уже обновляется)"""
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            return True
+
+    def end_refresh(self, key: str):
+        with self._lock:
+            self._refreshing.discard(key)
+
+    def batch(self, date_from: str, date_to: str) -> RollupBatch:
+        return RollupBatch(date_from, date_to)
+
+    def apply(self, batch: RollupBatch):
+        """
+        Заменить дни периода батча его данными
+
+        Кампании, у которых в батче нет строк, за этот период обнуляются.
+        """
+        date_from, date_to = batch.date_from, batch.date_to
+        account: Dict[str, Tuple] = {}
+        for days in batch.cells.values():
+            for day, values in days.items():
+                account[day] = _add(account.get(day, ZERO), values)
+
+        with self._lock:
+            for campaign_id in set(self.campaigns) | set(batch.cells):
+                series = self.campaigns.get(campaign_id)
+                if series is None:
+                    series = self.campaigns[campaign_id] = DailySeries()
+                days = batch.cells.get(campaign_id, {})
+                series.replace(date_from, date_to, {day: tuple(values) for day, values in days.items()})
+
+            self.account.replace(date_from, date_to, account)
+            self.campaign_names.update(batch.campaign_names)
+
+            fetched_at = time.time()
+            for day in report_days(date_from, date_to):
+                self._fetched[day] = fetched_at
+
+    def window(
+        self,
+        date_from: str,
+        date_to: str,
+        campaign_ids: Optional[List[int]] = None
+    ) -> ReportAggregator:
+        """
+        Итоги за период с разбивками по кампаниям и дням
+
+        Итоги и разбивка по кампаниям - O(кампаний); разбивка по дням
+        без фильтра берётся из итогов аккаунта за O(дней).
+        """
+        aggregator = ReportAggregator()
+        with self._lock:
+            selected = self.campaigns if campaign_ids is None else {
+                campaign_id: self.campaigns[campaign_id]
+                for campaign_id in campaign_ids if campaign_id in self.campaigns
+            }
+
+            for campaign_id, series in selected.items():
+                values = series.window(date_from, date_to)
+                if values is None:
+                    continue
+                totals = aggregator.by_campaign[campaign_id] = MetricTotals()
+                totals.add(*values)
+                aggregator.totals.add(*values)
+                aggregator.campaign_names[campaign_id] = self.campaign_names.get(campaign_id)
+
+            if campaign_ids is None:
+                daily = self.account.items(date_from, date_to)
+            else:
+                days: Dict[str, Tuple] = {}
+                for series in selected.values():
+                    for day, values in series.items(date_from, date_to):
+                        days[day] = _add(days.get(day, ZERO), values)
+                daily = days.items()
+
+            for day, values in daily:
+                aggregator.by_day[day] = MetricTotals()
+                aggregator.by_day[day].add(*values)
+
+        return aggregator
+
+    @classmethod
+    def answers(cls, query: ReportQuery) -> bool:
+        """Можно ли получить строки запроса из rollup"""
+        fields = set(query.api_fields)
+        return (
+            fields <= cls.FIELDS
+            and query.report_type in cls.REPORT_TYPES
+            and not query.extra_filters
+            and ("CampaignName" not in fields or "CampaignId" in fields)
+        )
+
+    def query_rows(self, query: ReportQuery, date_from: str, date_to: str) -> List[Dict]:
+        """
+        Строки отчёта по полям query (без производных метрик)
+
+        Строки группируются по тем из CampaignId и Date, что есть в полях,
+        как это сделал бы Reports.
+        """
+        by_campaign = "CampaignId" in query.api_fields
+        by_day = "Date" in query.api_fields
+        groups: Dict[Tuple, Tuple] = {}
+
+        with self._lock:
+            if by_campaign:
+                campaign_ids = self.campaigns if query.campaign_ids is None else query.campaign_ids
+                for campaign_id in campaign_ids:
+                    series = self.campaigns.get(campaign_id)
+                    if series is None:
+                        continue
+                    if by_day:
+                        for day, values in series.items(date_from, date_to):
+                            groups[(day, campaign_id)] = values
+                    else:
+                        values = series.window(date_from, date_to)
+                        if values is not None:
+                            groups[(None, campaign_id)] = values
+            else:
+                sources = [self.account] if query.campaign_ids is None else [
+                    self.campaigns[campaign_id] for campaign_id in query.campaign_ids
+                    if campaign_id in self.campaigns
+                ]
+                for series in sources:
+                    items = series.items(date_from, date_to) if by_day else [(None, series.window(date_from, date_to))]
+                    for day, values in items:
+                        if values is not None:
+                            groups[(day, None)] = _add(groups.get((day, None), ZERO), values)
+            names = dict(self.campaign_names)
+
+        rows = []
+        for day, campaign_id in sorted(groups, key=lambda key: (key[0] or "", key[1] or 0)):
+            values = groups[(day, campaign_id)]
+            if query.min_impressions and values[0] < query.min_impressions:
+                continue
+            row = dict(zip(METRICS, values))
+            row["Cost"] = round(row["Cost"], 6)
+            row.update(Date=day, CampaignId=campaign_id, CampaignName=names.get(campaign_id))
+            rows.append({field: row[field] for field in query.api_fields})
+        return rows
+
+
+class RollupStore:
+    """
+    Rollup'ы по логинам (общие для клиентов одного процесса)
+    """
+
+    def __init__(self, restatement_days: int = 3, recent_ttl: float = 900):
+        self.restatement_days = restatement_days
+        self.recent_ttl = recent_ttl
+        self._rollups: Dict[str, ReportRollup] = {}
+        self._lock = threading.Lock()
+
+    def get(self, login: str) -> ReportRollup:
+        with self._lock:
+            rollup = self._rollups.get(login)
+            if rollup is None:
+                rollup = self._rollups[login] = ReportRollup(self.restatement_days, self.recent_ttl)
+            return rollup
+
+    def invalidate(self, login: Optional[str] = None):
+        """Забыть rollup логина (или все)"""
+        with self._lock:
+            if login is None:
+                self._rollups.clear()
+            else:
+                self._rollups.pop(login, None)
@@ -0,0 +1,141 @@
+"""
+Тёплое состояние serverless-функций Vercel (api/*.py)
+Обработчики работают через тот же клиент YandexDirectAPI, что и бэкенд:
+пул соединений, кэш, объединение одинаковых запросов, rollup'ы и
+типизированный разбор отчётов общие для всех способов развёртывания.
+Пока экземпляр функции не выгружен, модуль остаётся импортированным:
+клиент с HTTP-сессией и кэшем переживает вызовы, поэтому тёплый вызов
+отвечает из памяти. Клиент Direct (и requests) импортируется только
+при первом обращении к API, чтобы холодный старт оставался маленьким.
+
+Расход считается так же, как в бэкенде: с НДС и без учёта скидки
+(IncludeDiscount=NO, суммы в валюте без микроединиц). Прежние функции
+запрашивали IncludeDiscount=YES, поэтому Cost, AvgCpc и итоги расхода
+в /api/stats с переходом на общее ядро стали выше на размер скидки.
+"""
+
+import os
+import json
+from typing import Any, Dict, Optional, Tuple
+
+from yandex_direct_cache import TTLCache
+from yandex_direct_http import NO_STORE, conditional_headers, etag_matches
+
+
+# Кэш живёт, пока жив экземпляр функции
+cache = TTLCache(
+    max_entries=int(os.getenv("YANDEX_DIRECT_CACHE_SIZE", "64")),
+    ttls={
+        "campaigns": int(os.getenv("YANDEX_DIRECT_CAMPAIGNS_TTL", "300")),
+        "reports": int(os.getenv("YANDEX_DIRECT_REPORTS_TTL", "900"))
+    }
+)
+
+_clients: Dict[Tuple[str, str], Any] = {}
+
+
+def credentials() -> Tuple[Optional[str], Optional[str]]:
+    """Токен и логин из переменных окружения"""
+    return os.getenv("YANDEX_DIRECT_TOKEN"), os.getenv("YANDEX_DIRECT_LOGIN")
+
+
+def client(access_token: str, login: str):
+    """
+    YandexDirectAPI экземпляра функции (создаётся при первом вызове)
+
+    Хранилище отчётов по дням подключается, если задан
+    YANDEX_DIRECT_STORE_PATH (например, /tmp/... - живёт вместе с экземпляром).
+    """
+    api = _clients.get((access_token, login))
+    if api is None:
+        from yandex_direct_api import YandexDirectAPI
+        from yandex_direct_limits import UnitsLimiter
+        from yandex_direct_rollup import RollupStore
+        from yandex_direct_store import ReportStore
+
+        store_path = os.getenv("YANDEX_DIRECT_STORE_PATH")
+        api = _clients[(access_token, login)] = YandexDirectAPI(
+            access_token,
+            login,
+            pool_connections=1,
+            pool_maxsize=4,
+            cache=cache,
+            store=ReportStore(store_path) if store_path else None,
+            limiter=UnitsLimiter(),
+            rollups=RollupStore()
+        )
+    return api
+
+
+def campaigns_result(api) -> Dict:
+    """
+    Список кампаний
+
+    Returns:
+        {"campaigns": [...]} или {"error": ..., "details": ...}
+    """
+    from yandex_direct_api import YandexDirectError
+
+    try:
+        return {"campaigns": list(api.iter_campaigns())}
+    except YandexDirectError as e:
+        return {"error": "Yandex API error", "details": e.to_dict()}
+
+
+def dashboard_stats(api, days: int = 30) -> Dict:
+    """
+    Итоги за последние days дней и показатели по кампаниям
+
+    Расход - с НДС, без учёта скидки (как в /api/yandex-direct/stats бэкенда).
+
+    Raises:
+        YandexDirectError: Direct вернул ошибку или отчёт не готов
+    """
+    campaigns = campaigns_result(api)
+    if "error" in campaigns:
+        raise Exception(f"Failed to get campaigns: {campaigns['details']}")
+
+    date_from, date_to = api.report_period(days)
+    aggregator = api.aggregate_report(None, date_from, date_to)
+
+    stats = aggregator.dashboard_stats(date_from, date_to)
+    stats["campaigns_count"] = len(campaigns["campaigns"])
+    stats["campaigns"] = [
+        {
+            "id": str(campaign["id"]),
+            "name": campaign["name"],
+            "impressions": campaign["impressions"],
+            "clicks": campaign["clicks"],
+            "cost": campaign["cost"],
+            "ctr": campaign["ctr"],
+            "conversions": campaign["conversions"]
+        }
+        for campaign in aggregator.campaigns()
+    ]
+    return stats
+
+
+def send_json(handler, status: int, payload: Any, endpoint: Optional[str] = None):
+    """
+    Ответить JSON из BaseHTTPRequestHandler
+
+    Успешный ответ эндпоинта получает ETag и Cache-Control с s-maxage
+    (CDN Vercel отвечает на повторы сам); если тело совпадает
+    с If-None-Match запроса, отдаётся 304 без тела.
+    """
+    body = json.dumps(payload).encode()
+    headers = conditional_headers(body, endpoint) if status == 200 and endpoint else {"Cache-Control": NO_STORE}
+
+    request_headers = getattr(handler, "headers", None)
+    if "ETag" in headers and request_headers is not None and etag_matches(request_headers.get("If-None-Match"), headers["ETag"]):
+        status, body = 304, b""
+
+    handler.send_response(status)
+    if body:
+        handler.send_header("Content-type", "application/json")
+    handler.send_header("Access-Control-Allow-Origin", "*")
+    for key, value in headers.items():
+        handler.send_header(key, value)
+    handler.end_headers()
+    if body:
+        handler.wfile.write(body)
@@ -0,0 +1,104 @@
+"""
+Снимок аккаунта Yandex Direct
+Кампании, группы, объявления, ключевые фразы и ставки в одной структуре
+с индексами по ID и по родительским объектам.
+"""
+
+import time
+from typing import Dict, Iterable, List, Optional
+
+
+class AccountSnapshot:
+    """
+    Объекты аккаунта, проиндексированные по ID
+
+    Группы, объявления и фразы дополнительно сгруппированы
+    по кампании и группе, ставки - по ID ключевой фразы.
+    """
+
+    # Ресурс -> поле с ID объекта
+    ID_FIELDS = {
+        "campaigns": "Id",
+        "adgroups": "Id",
+        "ads": "Id",
+        "keywords": "Id",
+        "bids": "KeywordId"
+    }
+
+    def __init__(self, login: str):
+        self.login = login
+        self.fetched_at = time.time()
+        self.campaigns: Dict[int, Dict] = {}
+        self.adgroups: Dict[int, Dict] = {}
+        self.ads: Dict[int, Dict] = {}
+        self.keywords: Dict[int, Dict] = {}
+        self.bids: Dict[int, Dict] = {}
+        self.adgroups_by_campaign: Dict[int, List[int]] = {}
+        self.ads_by_adgroup: Dict[int, List[int]] = {}
+        self.keywords_by_adgroup: Dict[int, List[int]] = {}
+        self.errors: List[Dict] = []
+
+    @staticmethod
+    def _link(index: Dict[int, List[int]], parent_id: Optional[int], child_id: int):
+        if parent_id is not None:
+            index.setdefault(parent_id, []).append(child_id)
+
+    def add(self, resource: str, items: Iterable[Dict]):
+        """
+        Добавить объекты ресурса
+
+        Args:
+            resource: campaigns, adgroups, ads, keywords или bids
+            items: Объекты из ответа API
+        """
+        objects = getattr(self, resource)
+        id_field = self.ID_FIELDS[resource]
+
+        for item in items:
+            item_id = item[id_field]
+            objects[item_id] = item
+
+            if resource == "adgroups":
+                self._link(self.adgroups_by_campaign, item.get("CampaignId"), item_id)
+            elif resource == "ads":
+                self._link(self.ads_by_adgroup, item.get("AdGroupId"), item_id)
+            elif resource == "keywords":
+                self._link(self.keywords_by_adgroup, item.get("AdGroupId"), item_id)
+
+    def add_error(self, resource: str, error: str):
+        """Запомнить ошибку загрузки ресурса (снимок тогда неполный)"""
+        self.errors.append({"resource": resource, "error": error})
+
+    @property
+    def is_complete(self) -> bool:
+        return not self.errors
+
+    def campaign_adgroups(self, campaign_id: int) -> List[Dict]:
+        """Группы кампании"""
+        return [self.adgroups[i] for i in self.adgroups_by_campaign.get(campaign_id, [])]
+
+    def adgroup_ads(self, adgroup_id: int) -> List[Dict]:
+        """Объявления группы"""
+        return [self.ads[i] for i in self.ads_by_adgroup.get(adgroup_id, [])]
+
+    def adgroup_keywords(self, adgroup_id: int) -> List[Dict]:
+        """Ключевые фразы группы"""
+        return [self.keywords[i] for i in self.keywords_by_adgroup.get(adgroup_id, [])]
+
+    def keyword_bid(self, keyword_id: int) -> Optional[Dict]:
+        """Ставки ключевой фразы"""
+        return self.bids.get(keyword_id)
+
+    def counts(self) -> Dict[str, int]:
+        """Количество объектов по ресурсам"""
+        return {resource: len(getattr(self, resource)) for resource in self.ID_FIELDS}
+
+    def to_dict(self) -> Dict:
+        """Снимок в виде списков объектов"""
+        return {
+            "login": self.login,
+            "fetched_at": self.fetched_at,
+            "counts": self.counts(),
+            "errors": self.errors,
+            **{resource: list(getattr(self, resource).values()) for resource in self.ID_FIELDS}
+        }
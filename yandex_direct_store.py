@@ -0,0 +1,262 @@
+"""
+Локальное хранилище отчётов Yandex Direct по дням (SQLite)
+Закрытые дни загружаются один раз; заново запрашиваются только
+сегодняшний день и окно пересчёта (restatement) за последние дни.
+"""
+
+import json
+import time
+import sqlite3
+import uuid
+import hashlib
+import itertools
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+def report_days(date_from: str, date_to: str) -> List[str]:
+    """Все дни периода в формате YYYY-MM-DD"""
+    start = datetime.strptime(date_from, "%Y-%m-%d").date()
+    end = datetime.strptime(date_to, "%Y-%m-%d").date()
+    return [(start + timedelta(days=i)).isoformat() for i in range((end - start).days + 1)]
+
+
+def day_closed_at(day: str, restatement_days: int) -> float:
+    """Время (time.time()), после которого Direct больше не пересчитывает день"""
+    closed = datetime.strptime(day, "%Y-%m-%d") + timedelta(days=restatement_days + 1)
+    return closed.timestamp()
+
+
+def stale_ranges(
+    fetched: Dict[str, float],
+    date_from: str,
+    date_to: str,
+    restatement_days: int,
+    recent_ttl: float
+) -> List[Tuple[str, str]]:
+    """
+    Диапазоны дат, которые нужно (пере)запросить у Direct
+
+    День закрыт, если его загрузили после окончания окна пересчёта
+    (после полуночи дня day + restatement_days + 1). Дни, загруженные
+    раньше - пока они были сегодняшними или в окне, - перезапрашиваются
+    через recent_ttl, даже если окно с тех пор прошло.
+
+    Args:
+        fetched: День -> время загрузки (time.time())
+        restatement_days: Сколько последних дней Direct ещё может пересчитать
+        recent_ttl: Через сколько секунд перезапрашивать незакрытые дни
+
+    Returns:
+        Непрерывные диапазоны (date_from, date_to) по возрастанию
+    """
+    now = time.time()
+
+    ranges: List[List[str]] = []
+    previous = None
+    for day in report_days(date_from, date_to):
+        fetched_at = fetched.get(day)
+        is_stale = fetched_at is None or (
+            fetched_at < day_closed_at(day, restatement_days) and now - fetched_at > recent_ttl
+        )
+        if is_stale:
+            # Продолжаем диапазон, если предыдущий день тоже нужно запросить
+            if ranges and ranges[-1][1] == previous:
+                ranges[-1][1] = day
+            else:
+                ranges.append([day, day])
+        previous = day
+
+    return [(start, end) for start, end in ranges]
+
+
+class ReportStore:
+    """
+    Строки отчётов, разложенные по дням
+
+    Для каждого набора (логин, поля, фильтр по кампаниям) хранится,
+    какие дни уже загружены и когда.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS report_days (
+            login TEXT NOT NULL,
+            report_key TEXT NOT NULL,
+            date TEXT NOT NULL,
+            fetched_at REAL NOT NULL,
+            PRIMARY KEY (login, report_key, date)
+        );
+        CREATE TABLE IF NOT EXISTS report_rows (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            login TEXT NOT NULL,
+            report_key TEXT NOT NULL,
+            date TEXT NOT NULL,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS report_rows_by_day
+            ON report_rows (login, report_key, date, id);
+        CREATE TABLE IF NOT EXISTS report_rows_staging (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            stage_id TEXT NOT NULL,
+            date TEXT NOT NULL,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS report_rows_staging_by_stage
+            ON report_rows_staging (stage_id, id);
+    """
+
+    # Сколько строк записывать одной транзакцией при загрузке диапазона
+    BATCH_SIZE = 1000
+
+    def __init__(
+        self,
+        path: str = "yandex_direct_reports.sqlite3",
+        restatement_days: int = 3,
+        recent_ttl: float = 900
+    ):
+        """
+        Args:
+            path: Путь к файлу SQLite
+            restatement_days: Сколько последних дней (кроме сегодня)
+                Direct ещё может пересчитать - их данные перезапрашиваются
+            recent_ttl: Через сколько секунд перезапрашивать сегодня
+                и дни окна пересчёта
+        """
+        self.path = path
+        self.restatement_days = restatement_days
+        self.recent_ttl = recent_ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._conn.executescript(self.SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    @staticmethod
+    def report_key(fields: List[str], campaign_ids: Optional[List[int]], filters: Optional[str] = None) -> str:
+        """Ключ набора строк: поля, фильтр по кампаниям и остальные фильтры"""
+        key = [list(fields), sorted(campaign_ids or [])]
+        if filters is not None:
+            key.append(filters)
+        raw = json.dumps(key)
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+    def missing_ranges(self, login: str, key: str, date_from: str, date_to: str) -> List[Tuple[str, str]]:
+        """
+        Диапазоны дат, которые нужно запросить у Direct
+
+        Returns:
+            Непрерывные диапазоны (date_from, date_to) по возрастанию
+        """
+        with self._lock:
+            fetched = dict(self._conn.execute(
+                "SELECT date, fetched_at FROM report_days "
+                "WHERE login = ? AND report_key = ? AND date BETWEEN ? AND ?",
+                (login, key, date_from, date_to)
+            ).fetchall())
+
+        return stale_ranges(fetched, date_from, date_to, self.restatement_days, self.recent_ttl)
+
+    def save_range(self, login: str, key: str, date_from: str, date_to: str, rows: Iterable[Dict]):
+        """
+        Заменить строки за диапазон дат и отметить дни как загруженные
+
+        rows может быть потоком прямо из Direct: он читается вне блокировки,
+        строки пишутся пачками по BATCH_SIZE короткими транзакциями
+        во временную таблицу и заменяют старые одной транзакцией в конце.
+        Дни без строк тоже отмечаются: у Direct за них просто нет данных.
+        """
+        stage_id = self.begin_stage()
+        try:
+            rows = iter(rows)
+            while True:
+                batch = list(itertools.islice(rows, self.BATCH_SIZE))
+                if not batch:
+                    break
+                self.stage_rows(stage_id, batch)
+            self.commit_stage(stage_id, login, key, date_from, date_to)
+        except BaseException:
+            self.discard_stage(stage_id)
+            raise
+
+    @staticmethod
+    def begin_stage() -> str:
+        """Идентификатор новой загрузки диапазона"""
+        return uuid.uuid4().hex
+
+    def stage_rows(self, stage_id: str, rows: List[Dict]):
+        """Записать пачку строк загрузки (читатели их ещё не видят)"""
+        records = [(stage_id, row["Date"], json.dumps(row, ensure_ascii=False)) for row in rows]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO report_rows_staging (stage_id, date, data) VALUES (?, ?, ?)",
+                records
+            )
+
+    def discard_stage(self, stage_id: str):
+        """Удалить строки незавершённой загрузки"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM report_rows_staging WHERE stage_id = ?", (stage_id,))
+
+    def commit_stage(self, stage_id: str, login: str, key: str, date_from: str, date_to: str):
+        """Заменить строки диапазона загруженными и отметить дни как загруженные"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM report_rows "
+                "WHERE login = ? AND report_key = ? AND date BETWEEN ? AND ?",
+                (login, key, date_from, date_to)
+            )
+            self._conn.execute(
+                "INSERT INTO report_rows (login, report_key, date, data) "
+                "SELECT ?, ?, date, data FROM report_rows_staging WHERE stage_id = ? ORDER BY id",
+                (login, key, stage_id)
+            )
+            self._conn.execute("DELETE FROM report_rows_staging WHERE stage_id = ?", (stage_id,))
+            fetched_at = time.time()
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO report_days (login, report_key, date, fetched_at) VALUES (?, ?, ?, ?)",
+                ((login, key, day, fetched_at) for day in report_days(date_from, date_to))
+            )
+
+    def read_page(
+        self,
+        login: str,
+        key: str,
+        date_from: str,
+        date_to: str,
+        after: Tuple[str, int] = ("", 0),
+        limit: int = 1000
+    ) -> Tuple[List[Dict], Optional[Tuple[str, int]]]:
+        """
+        Страница строк за период, упорядоченных по дате
+
+        Args:
+            after: Позиция (дата, id), после которой читать
+            limit: Размер страницы
+
+        Returns:
+            (строки, позиция для следующей страницы или None в конце)
+        """
+        last_date, last_id = after
+        with self._lock:
+            records = self._conn.execute(
+                "SELECT date, id, data FROM report_rows "
+                "WHERE login = ? AND report_key = ? AND date BETWEEN ? AND ? "
+                "AND (date > ? OR (date = ? AND id > ?)) "
+                "ORDER BY date, id LIMIT ?",
+                (login, key, date_from, date_to, last_date, last_date, last_id, limit)
+            ).fetchall()
+
+        rows = [json.loads(data) for _, _, data in records]
+        if len(records) < limit:
+            return rows, None
+        return rows, (records[-1][0], records[-1][1])
+
+    def iter_rows(self, login: str, key: str, date_from: str, date_to: str) -> Iterator[Dict]:
+        """Строки за период постранично, без загрузки всего периода в память"""
+        position = ("", 0)
+        while position is not None:
+            rows, position = self.read_page(login, key, date_from, date_to, position)
+            yield from rows
@@ -0,0 +1,171 @@
+"""
+Фоновый прогрев данных Yandex Direct
+По расписанию для каждого логина запрашиваются список кампаний, отчёт
+за вчера и стандартные окна дашборда, чтобы запросы пользователей почти
+всегда попадали в кэш. Прогрев пропускается, если баллов логина осталось
+меньше резерва: баллы в первую очередь нужны запросам пользователей.
+
+Запуск отдельным процессом:
+    python yandex_direct_warmup.py
+
+Отдельный воркер прогревает только свой кэш в памяти (TTLCache
+и rollup'ы процесса воркера) - процессу API они не видны. Общим
+с API остаётся лишь SQLite-хранилище отчётов (YANDEX_DIRECT_STORE_PATH
+должен указывать на один файл), поэтому воркер экономит API загрузку
+дней, а не запросы кампаний. Чтобы прогревать кэш самого API,
+задайте YANDEX_DIRECT_WARMUP_INTERVAL у бэкенда.
+"""
+
+import time
+import random
+import asyncio
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence
+
+from yandex_direct_limits import UnitsLimiter
+from yandex_direct_registry import ClientRegistry
+
+
+class WarmupScheduler:
+    """
+    Периодический прогрев кэша по всем логинам реестра
+    """
+
+    def __init__(
+        self,
+        clients: ClientRegistry,
+        limiter: Optional[UnitsLimiter] = None,
+        interval: float = 600,
+        windows: Sequence[int] = (7, 30, 90),
+        reserve_share: float = 0.3,
+        jitter: float = 0.1
+    ):
+        """
+        Args:
+            clients: Реестр клиентов (прогреваются все зарегистрированные логины)
+            limiter: Лимитер с остатками баллов (если None - без учёта баллов)
+            interval: Пауза между прогревами, секунды (меньше TTL кэша)
+            windows: Окна дашборда в днях
+            reserve_share: Доля суточного лимита баллов, которую прогрев
+                не трогает
+            jitter: Случайный разброс паузы (доля interval), чтобы
+                процессы не прогревались одновременно
+        """
+        self.clients = clients
+        self.limiter = limiter
+        self.interval = interval
+        self.windows = list(windows)
+        self.reserve_share = reserve_share
+        self.jitter = jitter
+        self.last_run: Dict[str, Dict] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def has_budget(self, login: str) -> bool:
+        """Баллов логина хватает на прогрев, не залезая в резерв"""
+        if self.limiter is None:
+            return True
+        if self.limiter.is_low(login):
+            return False
+        budget = self.limiter.budget(login)
+        if budget is None or not budget.daily_limit:
+            return True
+        return budget.remaining >= budget.daily_limit * self.reserve_share
+
+    def _steps(self, api) -> List:
+        """Что прогревать: (название, фабрика корутины)"""
+        yesterday = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
+        steps = [
+            ("campaigns", lambda: api.get_campaigns()),
+            ("yesterday", lambda: api.get_report(date_from=yesterday, date_to=yesterday))
+        ]
+        # Окна по убыванию: с rollup'ами или хранилищем первое окно
+        # загружает дни, а остальные считаются без запросов к Direct
+        for days in sorted(self.windows, reverse=True):
+            steps.append((f"window_{days}", lambda days=days: api.aggregate_report(None, *api.report_period(days))))
+        return steps
+
+    async def warm_login(self, login: str) -> Dict:
+        """
+        Прогреть данные одного логина
+
+        Returns:
+            Что прогрето, что пропущено из-за баллов и какие были ошибки
+        """
+        result = {"login": login, "started_at": time.time(), "warmed": [], "skipped": [], "errors": {}}
+        api = self.clients.get(login)
+
+        for name, step in self._steps(api):
+            if not self.has_budget(login):
+                result["skipped"].append(name)
+                continue
+            try:
+                value = await step()
+            except Exception as e:
+                result["errors"][name] = str(e)
+                continue
+            if isinstance(value, dict) and "error" in value:
+                result["errors"][name] = value["error"]
+            else:
+                result["warmed"].append(name)
+
+        result["finished_at"] = time.time()
+        self.last_run[login] = result
+        return result
+
+    async def run_once(self) -> List[Dict]:
+        """
+        Прогреть все логины по очереди
+
+        Логины не прогреваются параллельно: лимитер и так выдерживает
+        частоту запросов, а очередь не мешает запросам пользователей.
+        """
+        results = []
+        for login in self.clients.logins():
+            try:
+                results.append(await self.warm_login(login))
+            except Exception as e:
+                print(f"Error warming up {login}: {e}")
+        return results
+
+    async def run(self):
+        """Прогревать до отмены задачи"""
+        while True:
+            await self.run_once()
+            delay = self.interval * (1 + random.uniform(-self.jitter, self.jitter))
+            await asyncio.sleep(max(delay, 0))
+
+    def start(self) -> asyncio.Task:
+        """Запустить прогрев фоновой задачей в текущем event loop"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+        return self._task
+
+    async def stop(self):
+        """Остановить фоновую задачу"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def status(self) -> Dict:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "interval": self.interval,
+            "last_run": self.last_run
+        }
+
+
+if __name__ == "__main__":
+    # Отдельный воркер: те же логины и хранилище, что и у бэкенда
+    import os
+    from yandex_backend import clients, limiter
+
+    scheduler = WarmupScheduler(
+        clients,
+        limiter,
+        interval=float(os.getenv("YANDEX_DIRECT_WARMUP_INTERVAL") or 600)
+    )
+    asyncio.run(scheduler.run())